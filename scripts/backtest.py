@@ -0,0 +1,205 @@
+import multiprocessing
+import os
+import time
+import numpy as np
+import polars as pl
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.preprocessing import StandardScaler
+
+# Rows are ordered by gameweek, so every fold's training and validation rows are contiguous slices
+SORT_COLS = ['gameweek', 'element']
+
+# Trailing training gameweeks held out for early stopping, so the scored validation fold stays unseen
+EARLY_STOPPING_GAMEWEEKS = 1
+
+# Arrays attached from shared memory in each worker process
+_worker_arrays = {}
+
+
+def sort_by_gameweek(df):
+    """
+    `df` in gameweek order (then element); returned unchanged if it already is
+    """
+    in_order = df.select(
+        (pl.col('gameweek').diff() > 0) | ((pl.col('gameweek').diff() == 0) & (pl.col('element').diff() >= 0))
+    ).to_series().all()
+    return df if in_order else df.sort(SORT_COLS)
+
+
+def gameweek_folds(gameweeks, n_folds=5, horizon=1):
+    """
+    Walk-forward folds on gameweek boundaries: train on GW <= k, validate on GW k+1 ... k+horizon
+
+    The validation blocks are the last `n_folds` blocks of `horizon`
+    gameweeks and don't overlap. Returns a list of (train gameweeks,
+    validation gameweeks); folds without training data are left out.
+    """
+    unique = sorted(set(np.asarray(gameweeks).tolist()))
+    folds = []
+    for i in range(n_folds, 0, -1):
+        start = len(unique) - i * horizon
+        if start < 1:
+            continue
+        folds.append((unique[:start], unique[start:start + horizon]))
+    return folds
+
+
+def walk_forward_backtest(predictor, df, n_folds=5, horizon=1, max_workers=None):
+    """
+    Fit and score `predictor`'s model on every walk-forward fold, in parallel
+
+    The feature matrix is built once (see FPLPointPredictor.prepare_features)
+    and shared with the worker processes; each fold fits on a slice of it
+    without copying. Returns one row per fold with MAE, R², sizes, timings
+    and the model's feature importances (if it has them).
+    """
+    df = sort_by_gameweek(df)
+    X = predictor.prepare_features(df)
+    y = df[predictor.target_col].to_numpy().astype(np.float64)
+    tasks = fold_tasks(df['gameweek'].to_numpy(), n_folds, horizon)
+    for task in tasks:
+        print(f"Fold {task['fold']}: Training up to GW {task['train_until_gw']}, "
+              f"validating on GW {task['val_from_gw']}-{task['val_to_gw']}")
+
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    model = with_threads(predictor.model, workers)
+    start = time.perf_counter()
+    with fold_runner({'X': X, 'y': y}, workers) as run:
+        results = list(run([(model, predictor.scale_features, task) for task in tasks]))
+    elapsed = time.perf_counter() - start
+
+    table = pl.DataFrame(results).sort('fold')
+    print(f"Backtest of {len(tasks)} folds took {elapsed:.1f}s "
+          f"(slowest fold {(table['fit_seconds'] + table['predict_seconds']).max():.1f}s)")
+    return table
+
+
+def fold_tasks(gameweeks, n_folds=5, horizon=1):
+    """
+    Row ranges of the walk-forward folds for rows sorted by gameweek (see gameweek_folds)
+
+    Training rows are [train_start, train_stop) and validation rows
+    [train_stop, val_stop); train_start is 0 (all earlier gameweeks). Models
+    that stop early use the rows from stop_start (the last
+    EARLY_STOPPING_GAMEWEEKS training gameweeks) as their eval set, or none
+    if stop_start is None.
+    """
+    tasks = []
+    for fold, (train_gws, val_gws) in enumerate(gameweek_folds(gameweeks, n_folds, horizon)):
+        stop_gws = train_gws[-EARLY_STOPPING_GAMEWEEKS:] if len(train_gws) > EARLY_STOPPING_GAMEWEEKS else []
+        tasks.append({
+            'fold': fold + 1, 'train_until_gw': int(train_gws[-1]),
+            'val_from_gw': int(val_gws[0]), 'val_to_gw': int(val_gws[-1]),
+            'train_start': 0,
+            'stop_start': int(np.searchsorted(gameweeks, stop_gws[0], side='left')) if stop_gws else None,
+            'train_stop': int(np.searchsorted(gameweeks, train_gws[-1], side='right')),
+            'val_stop': int(np.searchsorted(gameweeks, val_gws[-1], side='right')),
+        })
+    if not tasks:
+        raise ValueError(f"Not enough gameweeks for a {horizon}-gameweek validation fold")
+    return tasks
+
+
+def with_threads(model, workers):
+    """A fresh copy of `model` whose n_jobs splits the cores between `workers` parallel fits."""
+    model = clone(model)
+    if workers > 1 and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=max(1, (os.cpu_count() or 1) // workers))
+    return model
+
+
+@contextmanager
+def fold_runner(arrays, workers):
+    """
+    Yields run(jobs), which fits (model, scale_features, task) jobs on the
+    'X' and 'y' in `arrays` and returns an iterator of their results, in order
+
+    With `workers` > 1 the arrays are placed in shared memory once and the
+    jobs run on a process pool that lives until the block exits.
+    """
+    if workers == 1:
+        yield lambda jobs: (_run_fold(model, scale, task, arrays['X'], arrays['y']) for model, scale, task in jobs)
+        return
+
+    blocks = {}
+    try:
+        specs = {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks[name] = block
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            specs[name] = (block.name, array.shape, array.dtype.str)
+
+        # spawn, because forking a process that already runs Polars/BLAS threads can deadlock
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_attach_arrays, initargs=(specs,)) as pool:
+            def run(jobs):
+                futures = [pool.submit(_run_shared_fold, model, scale, task) for model, scale, task in jobs]
+                return (future.result() for future in futures)
+            yield run
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _attach_arrays(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        _worker_arrays[name] = (block, array)
+
+
+def _run_shared_fold(model, scale_features, task):
+    return _run_fold(model, scale_features, task, _worker_arrays['X'][1], _worker_arrays['y'][1])
+
+
+def _run_fold(model, scale_features, task, X, y):
+    """
+    Fit a fresh copy of `model` on one fold; the training and validation rows are views of X and y
+    """
+    train_start, train_stop = task['train_start'], task['train_stop']
+    X_val, y_val = X[train_stop:task['val_stop']], y[train_stop:task['val_stop']]
+    stop_start = task.get('stop_start')
+    early_stopping = (getattr(model, 'supports_early_stopping', False)
+                      and stop_start is not None and train_start < stop_start < train_stop)
+    # The eval set for early stopping is the tail of the training gameweeks, never the scored fold
+    fit_stop = stop_start if early_stopping else train_stop
+    X_train, y_train = X[train_start:fit_stop], y[train_start:fit_stop]
+    X_stop, y_stop = X[fit_stop:train_stop], y[fit_stop:train_stop]
+    if scale_features:
+        # Fitted on the training rows only, so no validation statistics leak in
+        scaler = StandardScaler().fit(X_train)
+        X_train, X_val = scaler.transform(X_train), scaler.transform(X_val)
+        X_stop = scaler.transform(X_stop) if len(X_stop) else X_stop
+
+    model = clone(model)
+    start = time.perf_counter()
+    if early_stopping:
+        model.fit(X_train, y_train, eval_set=(X_stop, y_stop))
+    else:
+        model.fit(X_train, y_train)
+    fitted = time.perf_counter()
+    val_pred = model.predict(X_val)
+    predicted = time.perf_counter()
+
+    importances = getattr(model, 'feature_importances_', None)
+    return {
+        'fold': task['fold'],
+        'train_until_gw': task['train_until_gw'],
+        'val_from_gw': task['val_from_gw'],
+        'val_to_gw': task['val_to_gw'],
+        'train_rows': len(y_train),
+        'val_rows': len(y_val),
+        'mae': float(mean_absolute_error(y_val, val_pred)),
+        'r2': float(r2_score(y_val, val_pred)),
+        'fit_seconds': round(fitted - start, 3),
+        'predict_seconds': round(predicted - fitted, 3),
+        'best_iteration': getattr(model, 'best_iteration_', None),
+        'feature_importances': None if importances is None else np.asarray(importances, dtype=np.float64).tolist(),
+    }
@@ -1,24 +1,327 @@
+import hashlib
+import json
+import os
 import numpy as np
 import polars as pl
 
+# ALL performance metrics should be shifted to use only past data
+# This includes rolling averages for the last 5, 3, and 1 gameweeks
+# They relate to the current gameweek, so we only want prior weeks rolling data to avoid data leakage
+ROLL_FEATS = [
+    'assists', 'bps', 'clean_sheets', 'creativity', 'threat',
+    'expected_assists',  'expected_goal_involvements', 'expected_goals', 'expected_goals_conceded',
+    'goals_conceded', 'goals_scored', 'ict_index', 'influence', 'minutes', 'saves', 'starts',
+    'minutes_played', 'goals', 'total_shots', 'xg', 'xa', 'xgot', 'shots_on_target',
+    'successful_dribbles', 'touches_opposition_box', 'touches',
+    'accurate_passes_percent', 'final_third_passes', 'accurate_crosses_percent', 'accurate_long_balls_percent',
+    'tackles_won', 'tackles', 'interceptions', 'recoveries', 'blocks', 'clearances', 'headed_clearances',
+    'dribbled_past', 'duels_won', 'duels_lost', 'ground_duels_won', 'aerial_duels_won', 'fouls_committed',
+    'successful_dribbles_percent', 'goals_conceded_match', 'xgot_faced', 'goals_prevented', 'sweeper_actions',
+    'high_claim', 'gk_accurate_long_balls', 'gk_accurate_passes', 'offsides', 'penalties_saved', 'chances_created',
+    # curated team features
+    'team_goals', 'team_conceded', 'goal_difference', 'clean_sheet', 'team_won', 'team_drew', 'team_lost',
+]
 
-def create_ml_feature_set(df):
+# Also include total_points for rolling features
+FEATURES_TO_ROLL = ROLL_FEATS + ['total_points']
+
+# Rolling aggregates of every rolled feature, all over previous gameweeks only:
+#   <feat>_last<w>    mean of the last w gameweeks, for each w in WINDOWS (in this order)
+#   <feat>_ewm<span>  exponentially weighted mean with alpha = 2 / (span + 1), for each span in EWM_SPANS
+#   <feat>_season     mean of all previous gameweeks, if SEASON_TO_DATE
+#   <feat>_last1      the previous value
+# All of them come from the same running totals, so extra windows cost O(1) per row.
+WINDOWS = (5, 3)
+EWM_SPANS = ()
+SEASON_TO_DATE = False
+
+# Position codes used in place of position names
+POSITION_CODES = {'GK': 1, 'DEF': 2, 'MID': 3, 'FWD': 4, 'AM': 5}
+
+# Bump when the rolling arithmetic itself changes, so stored features are recomputed
+ROLLING_ENGINE_VERSION = 3
+
+# Drop cols which aren't needed for modeling:
+DROP_FEATS = [
+    # Redundant features that are already present in the dataset in other forms
+    'xP', 'bonus',  'round', 'player_id', 'assists_match', 'accurate_crosses', 'accurate_long_balls', 'accurate_passes',
+    'ground_duels_won_percent', 'aerial_duels_won_percent', 'tackles_won_percent', 'saves_match', 'gw', 'player_id_master',
+    'player_code',
+    # Idenfiers where I don't know enough about the data to use them
+    'fixture', 'opponent_team', 'selected', 'modified',
+    # Identifiers which occur rarely, and likely not useful for modeling
+    'own_goals', 'penalties_missed', 'red_cards', 'yellow_cards', 'big_chances_missed', 'was_fouled',
+    # Home/ away stats, to convert to different features before rolling:
+    'team_h_score', 'team_a_score', 'home_team', 'away_team', 'away_score', 'home_score', 'team_id', 'was_home',
+]
+
+
+def create_ml_feature_set(df, state_path=None, windows=None, ewm_spans=None, season_to_date=None, fill_nulls=True):
     """
     Create features to use in downstream ML models.
+
+    `windows`, `ewm_spans` and `season_to_date` select the rolling aggregates
+    and default to WINDOWS, EWM_SPANS and SEASON_TO_DATE. With
+    `fill_nulls=False`, missing values (e.g. rolling features of a player's
+    first gameweek) stay null for models that handle them. If `state_path` is
+    given, the per-player rolling state after the last gameweek is saved
+    there, so later gameweeks can be added with update_ml_feature_set instead
+    of recomputing the season.
+    """
+    config = rolling_config(windows, ewm_spans, season_to_date)
+    df = _prepare_base(df).sort(['element', 'gameweek'])
+
+    # Create all rolling features at once from the per-player running totals
+    values = _feature_matrix(df)
+    starts, position = _row_positions(df['element'].to_numpy())
+    prior = _running_state(values, position, config)
+    df = df.with_columns(_rolling_columns(prior, _window_lags(prior, position, config), config, dtypes=df.schema))
+
+    if state_path is not None:
+        ends = np.r_[starts[1:], len(df)] - 1
+        state = _step({name: array[ends] for name, array in prior.items()}, values[ends], config)
+        state['lag_total'], state['lag_count'] = _end_lags(prior, ends, position, config)
+        state.update(elements=df['element'].to_numpy()[ends], last_gameweek=df['gameweek'].to_numpy()[ends])
+        save_rolling_state(state_path, state, config)
+
+    return _finalize(df, fill_nulls)
+
+
+def rolling_feature_columns(df, features, windows=None, ewm_spans=None, season_to_date=None):
+    """
+    Compute only the rolling columns of `features`, keyed by element and gameweek
+
+    Gives the same values as create_ml_feature_set for those columns; used to
+    refresh part of a stored feature set after its definition changed.
+    """
+    config = rolling_config(windows, ewm_spans, season_to_date)
+    df = _prepare_base(df).sort(['element', 'gameweek'])
+    _, position = _row_positions(df['element'].to_numpy())
+    prior = _running_state(_feature_matrix(df, features), position, config)
+    columns = _rolling_columns(prior, _window_lags(prior, position, config), config, features, df.schema)
+    return df.select(['element', 'gameweek']).with_columns(columns).fill_null(0)
+
+
+def per_row_feature_columns(df):
+    """
+    The per-row (non-rolling) columns of create_ml_feature_set, in its row order
+    """
+    return _finalize(_prepare_base(df).sort(['element', 'gameweek']))
+
+
+def rolling_config(windows=None, ewm_spans=None, season_to_date=None):
+    """
+    The rolling aggregates to compute, with the module defaults filled in
+
+    Window 1 is always produced as _last1, so it is dropped from `windows`.
+    """
+    windows = WINDOWS if windows is None else windows
+    ewm_spans = EWM_SPANS if ewm_spans is None else ewm_spans
+    if any(int(w) < 1 for w in windows) or any(span < 1 for span in ewm_spans):
+        raise ValueError(f"Rolling windows and EWM spans must be at least 1, got {windows} and {ewm_spans}")
+    return {
+        'windows': tuple(dict.fromkeys(int(w) for w in windows if int(w) > 1)),
+        'ewm_spans': tuple(dict.fromkeys(float(span) for span in ewm_spans)),
+        'season_to_date': SEASON_TO_DATE if season_to_date is None else bool(season_to_date),
+    }
+
+
+def rolling_column_names(features=FEATURES_TO_ROLL, windows=None, ewm_spans=None, season_to_date=None):
+    """Output column names of the rolling features, in create_ml_feature_set order."""
+    return [name for name, _, _ in _rolling_specs(features, rolling_config(windows, ewm_spans, season_to_date))]
+
+
+def _rolling_specs(features, config):
+    # (column name, feature, aggregate) of every rolling output column, in output order
+    specs = []
+    for feat in features:
+        specs += [(f'{feat}_last{w}', feat, ('window', w)) for w in config['windows']]
+        specs += [(f'{feat}_ewm{span:g}', feat, ('ewm', span)) for span in config['ewm_spans']]
+        if config['season_to_date']:
+            specs.append((f'{feat}_season', feat, ('season', None)))
+        specs.append((f'{feat}_last1', feat, ('last', 1)))
+    return specs
+
+
+def _row_positions(elements):
+    # Start index of every player's run of rows, and each row's position within it
+    if len(elements) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, elements[1:] != elements[:-1]])
+    return starts, np.arange(len(elements)) - np.repeat(starts, np.diff(np.r_[starts, len(elements)]))
+
+
+def _empty_state(rows, n_features, config):
+    """
+    Rolling state of players with no previous gameweeks
+
+    total/count are the running sum and number of non-missing values,
+    ewm_num/ewm_den the EWM numerator and weight per span, last the previous
+    value, and lag_total/lag_count the running totals of the last
+    max(windows) gameweeks, oldest first (zero before the first one).
+    """
+    lags = max(config['windows'], default=0)
+    spans = len(config['ewm_spans'])
+    return {
+        'total': np.zeros((rows, n_features)),
+        'count': np.zeros((rows, n_features)),
+        'ewm_num': np.zeros((rows, spans, n_features)),
+        'ewm_den': np.zeros((rows, spans, n_features)),
+        'last': np.full((rows, n_features), np.nan),
+        'lag_total': np.zeros((rows, lags, n_features)),
+        'lag_count': np.zeros((rows, lags, n_features)),
+    }
+
+
+def _step(state, values, config):
+    """
+    State after one more gameweek with `values`; shared by the full and incremental paths so they agree exactly
+    """
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    decay = 1.0 - 2.0 / (np.array(config['ewm_spans'], dtype=np.float64)[:, None] + 1.0)
+    # Missing gameweeks leave the EWM untouched
+    return {
+        'total': state['total'] + filled,
+        'count': state['count'] + present,
+        'ewm_num': np.where(present[:, None, :], decay * state['ewm_num'] + filled[:, None, :], state['ewm_num']),
+        'ewm_den': np.where(present[:, None, :], decay * state['ewm_den'] + 1.0, state['ewm_den']),
+        'last': values,
+    }
+
+
+def _running_state(values, position, config):
+    """
+    Rolling state before every row, for rows sorted by element with `position` within their player
+
+    Players are advanced together, one gameweek position per round.
+    """
+    prior = _empty_state(len(values), values.shape[1], config)
+    del prior['lag_total'], prior['lag_count']
+    order = np.argsort(position, kind='stable')
+    bounds = np.searchsorted(position[order], np.arange(position.max() + 2 if len(position) else 1))
+    for round_ in range(1, len(bounds) - 1):
+        rows = order[bounds[round_]:bounds[round_ + 1]]
+        for name, array in _step({name: array[rows - 1] for name, array in prior.items()},
+                                 values[rows - 1], config).items():
+            prior[name][rows] = array
+    return prior
+
+
+def _window_lags(prior, position, config):
+    # Running totals `window` rows earlier for the same player, zero before their first row
+    lags = {}
+    for window in config['windows']:
+        earlier = np.flatnonzero(position >= window)
+        lag_total, lag_count = np.zeros_like(prior['total']), np.zeros_like(prior['count'])
+        lag_total[earlier] = prior['total'][earlier - window]
+        lag_count[earlier] = prior['count'][earlier - window]
+        lags[window] = (lag_total, lag_count)
+    return lags
+
+
+def _end_lags(prior, ends, position, config):
+    # Running totals of the last max(windows) rows of every player, as kept in the saved state
+    lags = max(config['windows'], default=0)
+    lag_total = np.zeros((len(ends), lags, prior['total'].shape[1]))
+    lag_count = np.zeros_like(lag_total)
+    for j in range(lags):
+        back = lags - 1 - j
+        valid = position[ends] >= back
+        lag_total[valid, j] = prior['total'][ends[valid] - back]
+        lag_count[valid, j] = prior['count'][ends[valid] - back]
+    return lag_total, lag_count
+
+
+def update_ml_feature_set(new_rows, state_path, fill_nulls=True):
+    """
+    Create the feature rows of newly appended gameweek(s) from the saved rolling state
+
+    `new_rows` must come after every gameweek already in the state for their
+    players. Only these rows are processed, and the result is identical to the
+    matching rows of create_ml_feature_set on the full history, with the
+    rolling aggregates the state was built with. The state file is updated to
+    include them.
+    """
+    return _incremental_feature_set(new_rows, state_path, update_state=True, fill_nulls=fill_nulls)
+
+
+def next_gameweek_features(fixture_rows, state_path, fill_nulls=True):
+    """
+    Create feature rows for an upcoming gameweek from the saved rolling state
+
+    Rolling features only use previous gameweeks, so the stats columns of
+    `fixture_rows` may be empty; the state file is left unchanged.
+    """
+    return _incremental_feature_set(fixture_rows, state_path, update_state=False, fill_nulls=fill_nulls)
+
+
+def _incremental_feature_set(new_rows, state_path, update_state, fill_nulls):
+    state, config = load_rolling_state(state_path)
+    df = _prepare_base(new_rows).sort(['element', 'gameweek'])
+    values = _feature_matrix(df)
+    elements = df['element'].to_numpy()
+    gameweeks = df['gameweek'].to_numpy()
+
+    # Existing players continue from their saved state; new ones start empty
+    slot_of = {element: i for i, element in enumerate(state['elements'])}
+    new_elements = [element for element in dict.fromkeys(elements) if element not in slot_of]
+    for element in new_elements:
+        slot_of[element] = len(slot_of)
+    empty = _empty_state(len(new_elements), values.shape[1], config)
+    players = {name: np.concatenate([state[name], empty[name]]) for name in empty}
+    last_gameweek = np.concatenate([state['last_gameweek'], np.full(len(new_elements), np.iinfo(np.int64).min)])
+    slots = np.array([slot_of[element] for element in elements], dtype=np.int64)
+
+    stale = gameweeks <= last_gameweek[slots]
+    if stale.any():
+        raise ValueError(f"{stale.sum()} rows are not after the last gameweek in the rolling state; "
+                         "rebuild it with create_ml_feature_set")
+
+    # Rows of the same player are applied in gameweek order, one round per row
+    _, position = _row_positions(elements)
+    lags = max(config['windows'], default=0)
+    prior = {name: np.empty((len(df),) + array.shape[1:]) for name, array in players.items()}
+    for round_ in range(position.max() + 1 if len(df) else 0):
+        rows = np.flatnonzero(position == round_)
+        before = {name: array[slots[rows]] for name, array in players.items()}
+        for name, array in before.items():
+            prior[name][rows] = array
+        after = _step(before, values[rows], config)
+        if lags:
+            after['lag_total'] = np.concatenate([before['lag_total'][:, 1:], before['total'][:, None]], axis=1)
+            after['lag_count'] = np.concatenate([before['lag_count'][:, 1:], before['count'][:, None]], axis=1)
+        for name, array in after.items():
+            players[name][slots[rows]] = array
+        last_gameweek[slots[rows]] = gameweeks[rows]
+
+    window_lags = {w: (prior['lag_total'][:, lags - w], prior['lag_count'][:, lags - w]) for w in config['windows']}
+    df = df.with_columns(_rolling_columns(prior, window_lags, config, dtypes=df.schema))
+
+    if update_state:
+        players.update(elements=np.array(list(slot_of), dtype=np.int64), last_gameweek=last_gameweek)
+        save_rolling_state(state_path, players, config)
+
+    return _finalize(df, fill_nulls)
+
+
+def _prepare_base(df):
+    """
+    Per-row features (positions, booleans, team results) computed before rolling
     """
     # Convert to Polars
     df = pl.from_pandas(df)
-    
+
     # Map positions
     df = df.with_columns(
-            pl.col('position').replace({'GK': 1, 'DEF': 2, 'MID': 3, 'FWD': 4, 'AM': 5}).cast(pl.Int64)
+            pl.col('position').replace(POSITION_CODES).cast(pl.Int64)
         )
-    
+
     # Convert booleans to float
     bool_cols = [col for col in df.columns if df[col].dtype == pl.Boolean]
     if bool_cols:
         df = df.with_columns([pl.col(col).cast(pl.Float64) for col in bool_cols])
-    
+
     # Create team features - handle was_home as either boolean or float
     # Check if was_home exists and its type
     if 'was_home' in df.columns:
@@ -33,7 +336,7 @@ def create_ml_feature_set(df):
               .otherwise(pl.col('home_score'))
               .alias('team_conceded'),
         ])
-    
+
     df = df.with_columns([
         (pl.col('team_goals') - pl.col('team_conceded')).alias('goal_difference'),
         (pl.col('team_conceded') == 0).cast(pl.Float64).alias('clean_sheet'),
@@ -41,69 +344,125 @@ def create_ml_feature_set(df):
         (pl.col('team_goals') == pl.col('team_conceded')).cast(pl.Float64).alias('team_drew'),
         (pl.col('team_goals') < pl.col('team_conceded')).cast(pl.Float64).alias('team_lost'),
     ])
+    return df
 
-    # ALL performance metrics should be shifted to use only past data
-    # This includes rolling averages for the last 5, 3, and 1 gameweeks
-    # They relate to the current gameweek, so we only want prior weeks rolling data to avoid data leakage
-    roll_feats = [
-        'assists', 'bps', 'clean_sheets', 'creativity', 'threat', 
-        'expected_assists',  'expected_goal_involvements', 'expected_goals', 'expected_goals_conceded',
-        'goals_conceded', 'goals_scored', 'ict_index', 'influence', 'minutes', 'saves', 'starts', 
-        'minutes_played', 'goals', 'total_shots', 'xg', 'xa', 'xgot', 'shots_on_target',
-        'successful_dribbles', 'touches_opposition_box', 'touches', 
-        'accurate_passes_percent', 'final_third_passes', 'accurate_crosses_percent', 'accurate_long_balls_percent',
-        'tackles_won', 'tackles', 'interceptions', 'recoveries', 'blocks', 'clearances', 'headed_clearances',
-        'dribbled_past', 'duels_won', 'duels_lost', 'ground_duels_won', 'aerial_duels_won', 'fouls_committed',
-        'successful_dribbles_percent', 'goals_conceded_match', 'xgot_faced', 'goals_prevented', 'sweeper_actions',
-        'high_claim', 'gk_accurate_long_balls', 'gk_accurate_passes', 'offsides', 'penalties_saved', 'chances_created',
-        # curated team features
-        'team_goals', 'team_conceded', 'goal_difference', 'clean_sheet', 'team_won', 'team_drew', 'team_lost',
-    ]
-    
-    # Also include total_points for rolling features
-    features_to_roll = roll_feats + ['total_points']
-    
-    # Create all rolling features at once using Polars expressions
-    rolling_exprs = []
-    
-    for feat in features_to_roll:
-        # Last 5 games
-        rolling_exprs.append(
-            pl.col(feat).shift(1).rolling_mean(5, min_periods=1)
-            .over('element').alias(f'{feat}_last5')
-        )
-        # Last 3 games
-        rolling_exprs.append(
-            pl.col(feat).shift(1).rolling_mean(3, min_periods=1)
-            .over('element').alias(f'{feat}_last3')
-        )
-        # Last game
-        rolling_exprs.append(
-            pl.col(feat).shift(1).over('element').alias(f'{feat}_last1')
-        )
-    
-    # Apply all rolling calculations at once
-    df = df.sort(['element', 'gameweek']).with_columns(rolling_exprs)
-    
-    # Drop cols which aren't needed for modeling:
-    drop_feats = [
-        # Redundant features that are already present in the dataset in other forms
-        'xP', 'bonus',  'round', 'player_id', 'assists_match', 'accurate_crosses', 'accurate_long_balls', 'accurate_passes',
-        'ground_duels_won_percent', 'aerial_duels_won_percent', 'tackles_won_percent', 'saves_match', 'gw', 'player_id_master',
-        'player_code', 
-        # Idenfiers where I don't know enough about the data to use them
-        'fixture', 'opponent_team', 'selected', 'modified', 
-        # Identifiers which occur rarely, and likely not useful for modeling
-        'own_goals', 'penalties_missed', 'red_cards', 'yellow_cards', 'big_chances_missed', 'was_fouled',
-        # Home/ away stats, to convert to different features before rolling:
-        'team_h_score', 'team_a_score', 'home_team', 'away_team', 'away_score', 'home_score', 'team_id', 'was_home', 
-    ]
 
+def _feature_matrix(df, features=FEATURES_TO_ROLL):
+    # One float64 column per rolled feature, NaN where the value is missing
+    return df.select([pl.col(feat).cast(pl.Float64) for feat in features]).to_numpy().astype(np.float64)
+
+
+def _rolling_columns(prior, window_lags, config, features=FEATURES_TO_ROLL, dtypes=None):
+    """
+    Rolling feature columns from the rolling state before each row
+
+    A window mean is the difference of two running totals, so its cost does
+    not depend on the window length. Both the full and the incremental path
+    go through this function with the same state, so their results are
+    bit-identical. The previous value (_last1) keeps the feature's dtype
+    from `dtypes` (a schema), as a plain shift would.
+    """
+    def mean(total, count):
+        return np.divide(total, count, out=np.full_like(total, np.nan), where=count > 0)
+
+    aggregates = {('last', 1): prior['last']}
+    for window, (lag_total, lag_count) in window_lags.items():
+        aggregates[('window', window)] = mean(prior['total'] - lag_total, prior['count'] - lag_count)
+    for s, span in enumerate(config['ewm_spans']):
+        aggregates[('ewm', span)] = mean(prior['ewm_num'][:, s], prior['ewm_den'][:, s])
+    if config['season_to_date']:
+        aggregates[('season', None)] = mean(prior['total'], prior['count'])
+
+    index = {feat: j for j, feat in enumerate(features)}
+    columns = []
+    for name, feat, aggregate in _rolling_specs(features, config):
+        column = pl.Series(name, aggregates[aggregate][:, index[feat]], dtype=pl.Float64, nan_to_null=True)
+        dtype = (dtypes or {}).get(feat)
+        if aggregate == ('last', 1) and dtype is not None and dtype.is_numeric():
+            column = column.cast(dtype)
+        columns.append(column)
+    return columns
+
+
+def _finalize(df, fill_nulls=True):
     # Also now drop the current week performance features which were used to create the rolling features
-    all_drop_feats = drop_feats + roll_feats
+    all_drop_feats = DROP_FEATS + ROLL_FEATS
     df = df.drop([col for col in all_drop_feats if col in df.columns])
 
     # Replace all null values in the entire dataframe with 0
-    df = df.fill_null(0)
-    
-    return df
\ No newline at end of file
+    if fill_nulls:
+        df = df.fill_null(0)
+
+    return df
+
+
+def feature_definition_hash():
+    """
+    Hash of everything that defines the feature set: rolled features, aggregates, drop list and encodings
+    """
+    return _digest({
+        'roll_feats': FEATURES_TO_ROLL, 'rolling': rolling_config(), 'drop_feats': DROP_FEATS,
+        'position_codes': POSITION_CODES, 'engine': ROLLING_ENGINE_VERSION,
+    })
+
+
+def feature_column_hashes(columns):
+    """
+    Definition hash of each output column of create_ml_feature_set
+
+    A rolling column depends only on its feature, aggregate and the rolling
+    engine; any other column is a per-row value and depends on the base
+    transformations. Comparing these tells which stored columns are stale.
+    """
+    rolled = {
+        name: {'feature': feat, 'aggregate': list(aggregate), 'engine': ROLLING_ENGINE_VERSION}
+        for name, feat, aggregate in _rolling_specs(FEATURES_TO_ROLL, rolling_config())
+    }
+    base = {'position_codes': POSITION_CODES}
+    return {col: _digest(rolled.get(col) or {'column': col, **base}) for col in columns}
+
+
+def rolled_feature_of(column):
+    """The FEATURES_TO_ROLL entry a rolling output column comes from, or None for per-row columns."""
+    for name, feat, _ in _rolling_specs(FEATURES_TO_ROLL, rolling_config()):
+        if name == column:
+            return feat
+    return None
+
+
+def _digest(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+# Per-player arrays of the rolling state, see _empty_state
+STATE_ARRAYS = ('total', 'count', 'ewm_num', 'ewm_den', 'last', 'lag_total', 'lag_count')
+
+
+def save_rolling_state(path, state, config):
+    """
+    Save per-player rolling state: running totals, EWM sums and lagged totals of every rolled feature
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        features=np.array(FEATURES_TO_ROLL),
+        windows=np.array(config['windows'], dtype=np.int64),
+        ewm_spans=np.array(config['ewm_spans'], dtype=np.float64),
+        season_to_date=np.array(config['season_to_date']),
+        elements=np.asarray(state['elements'], dtype=np.int64),
+        last_gameweek=np.asarray(state['last_gameweek'], dtype=np.int64),
+        **{name: np.asarray(state[name], dtype=np.float64) for name in STATE_ARRAYS},
+    )
+    os.replace(tmp_path, path)
+
+
+def load_rolling_state(path):
+    """Load a saved rolling state and the rolling aggregates it was built with."""
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files}
+    if list(state['features']) != FEATURES_TO_ROLL or any(name not in state for name in STATE_ARRAYS):
+        raise ValueError(f"Rolling state at {path} was built for different features; "
+                         "rebuild it with create_ml_feature_set")
+    config = rolling_config(state['windows'].tolist(), state['ewm_spans'].tolist(), state['season_to_date'].item())
+    return state, config
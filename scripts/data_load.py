@@ -1,95 +1,144 @@
+import hashlib
+import multiprocessing
+import resource
+import shutil
+import sys
+import tempfile
+import time
 import pandas as pd
 import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def load_all_gameweek_data(base_path="data/2024-2025"):
+from scripts import schema
+from scripts.schema import apply_schema, memory_mb, read_table_arrow, read_table_csv, table_to_pandas
+
+# Frames returned by load_and_link_all_data, in order, as named in its cache
+LINKED_FRAME_NAMES = ('ml_dataset', 'matches_df', 'player_matches_enhanced')
+
+def load_all_gameweek_data(base_path="data/2024-2025", max_workers=None):
     """
     Load all gameweek match and player match data
     """
-    # Initialize lists to store all gameweek data
-    all_matches = []
-    all_player_matches = []
-    
-    # Find all GW folders
+    files = _discover_gameweek_files(base_path)
+    print(f"Found {files['n_folders']} gameweek folders")
+
+    # Read every file concurrently and combine once
+    matches_combined = _read_gameweek_csvs(files['matches'], 'matches', max_workers)
+    player_matches_combined = _read_gameweek_csvs(files['playermatchstats'], 'playermatchstats', max_workers)
+
+    # Replace NaN values with zero (categoricals have no 0 category and keep their gaps)
+    for name, df in [('matches', matches_combined), ('playermatchstats', player_matches_combined)]:
+        fill_cols = [col for col in df.columns if not isinstance(df[col].dtype, pd.CategoricalDtype)]
+        df[fill_cols] = df[fill_cols].fillna(0)
+        print(f"  {name}: {len(df)} rows, {memory_mb(df):.2f} MB in memory")
+
+    return matches_combined, player_matches_combined
+
+
+def _discover_gameweek_files(base_path):
+    """
+    Find every per-gameweek matches / player match stats file before reading any of them
+    """
     matches_path = Path(base_path) / "matches"
     player_matches_path = Path(base_path) / "playermatchstats"
-    
+
     # Get all GW folders (assuming they follow GW1, GW2, ... pattern)
     gw_folders = sorted([f for f in matches_path.iterdir() if f.is_dir() and f.name.startswith("GW")])
-    
-    print(f"Found {len(gw_folders)} gameweek folders")
-    
+
+    files = {'n_folders': len(gw_folders), 'matches': [], 'playermatchstats': []}
     for gw_folder in gw_folders:
         gw_num = int(gw_folder.name.replace("GW", ""))
-        
-        # Load matches for this gameweek
         matches_file = gw_folder / "matches.csv"
         if matches_file.exists():
-            matches_df = pd.read_csv(matches_file)
-            matches_df['gw'] = gw_num  # Add gameweek number
-            all_matches.append(matches_df)
-        
-        # Load player match stats for this gameweek
+            files['matches'].append((gw_num, matches_file))
         player_matches_file = player_matches_path / f"GW{gw_num}" / "playermatchstats.csv"
         if player_matches_file.exists():
-            player_matches_df = pd.read_csv(player_matches_file)
-            player_matches_df['gw'] = gw_num  # Add gameweek number
-            all_player_matches.append(player_matches_df)
-    
-    # Combine all gameweeks
-    matches_combined = pd.concat(all_matches, ignore_index=True) if all_matches else pd.DataFrame()
-    player_matches_combined = pd.concat(all_player_matches, ignore_index=True) if all_player_matches else pd.DataFrame()
+            files['playermatchstats'].append((gw_num, player_matches_file))
+    return files
 
-    # Replace NaN values with zero
-    matches_combined.fillna(0, inplace=True)
-    player_matches_combined.fillna(0, inplace=True)
-    
-    return matches_combined, player_matches_combined
+
+def _read_gameweek_csvs(files, table_name, max_workers=None):
+    """
+    Read [(gameweek, path), ...] on a thread pool into one DataFrame with a 'gw' column
+    """
+    if not files:
+        return pd.DataFrame()
+    return table_to_pandas(_read_gameweek_tables(files, table_name, max_workers), table_name)
+
+
+def _read_gameweek_tables(files, table_name, max_workers=None):
+    """
+    Read [(gameweek, path), ...] on a thread pool into one Arrow table with a 'gw' column
+
+    Every file is parsed straight into the compact registry types of
+    `table_name` (see scripts/schema.py), so nothing is inferred per file. The
+    gameweek is attached as a partition value after concatenation.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        tables = list(pool.map(lambda path: read_table_arrow(path, table_name), [path for _, path in files]))
+
+    # A file that fell back to inferred types is promoted to the common type here
+    combined = pa.concat_tables(tables, promote_options="permissive")
+    gameweeks = np.repeat([gw for gw, _ in files], [table.num_rows for table in tables])
+    return combined.append_column('gw', pa.array(gameweeks, pa.int16()))
 
 
-def load_and_link_all_data(base_path="data/2024-2025"):
+def load_and_link_all_data(base_path="data/2024-2025", max_workers=None, use_cache=True, cache_dir=None,
+                           fill_blank_gameweeks=False, engine="pandas", streaming=False):
     """
     Load and link all datasets including match-level statistics
+
+    With `use_cache` the three returned frames are persisted as Arrow IPC files
+    under `cache_dir` (default: `<base_path>/.cache`), keyed by a fingerprint of
+    the source files and of this module. Later calls memory-map them instead
+    of re-reading and re-linking the CSVs, so kernels share the same pages.
+
+    `fill_blank_gameweeks` adds zero rows for gameweeks a player's team had no
+    fixture (see add_blank_gameweeks).
+
+    `engine="polars"` builds the whole linkage as one lazy Polars plan instead
+    of chained pandas merges (optionally collected with the streaming engine);
+    see compare_link_engines for the memory difference.
     """
+    if engine not in ("pandas", "polars"):
+        raise ValueError(f"Unknown engine '{engine}', expected 'pandas' or 'polars'")
+    link = _link_with_polars if engine == "polars" else _load_and_link_all_data
+    options = {"streaming": streaming} if engine == "polars" else {}
+
+    if not use_cache:
+        return link(base_path, max_workers, fill_blank_gameweeks, **options)
+
+    fingerprint = _link_fingerprint(base_path, fill_blank_gameweeks=fill_blank_gameweeks, engine=engine)
+    cache_path = Path(cache_dir or Path(base_path) / ".cache") / f"linked-{fingerprint}"
+    if cache_path.exists():
+        print(f"Loading linked datasets from cache: {cache_path}")
+        return tuple(_read_arrow_file(cache_path / f"{name}.arrow") for name in LINKED_FRAME_NAMES)
+
+    result = link(base_path, max_workers, fill_blank_gameweeks, **options)
+    _write_link_cache(cache_path, result)
+    return result
+
+
+def _load_and_link_all_data(base_path, max_workers=None, fill_blank_gameweeks=False):
     # 1. Load base datasets
     print("Loading base datasets...")
     fpl_player = pd.read_csv(f"{base_path}/gws/merged_gw.csv")
-    players_master = pd.read_csv(f"{base_path}/players/players.csv")
+    players_master = read_table_csv(f"{base_path}/players/players.csv", 'players')
     
     # team_stats = pd.read_csv(f"{base_path}/teams/teams.csv")  
     # # Removed as the values for each team are static (i.e. not weekly)
     
     # 2. Load all gameweek match data
     print("\nLoading match data across all gameweeks...")
-    all_matches = []
-    all_player_matches = []
-    
-    from pathlib import Path
-    matches_path = Path(base_path) / "matches"
-    player_matches_path = Path(base_path) / "playermatchstats"
-    
-    gw_folders = sorted([f for f in matches_path.iterdir() if f.is_dir() and f.name.startswith("GW")])
-    
-    for gw_folder in gw_folders:
-        gw_num = int(gw_folder.name.replace("GW", ""))
-        
-        # Load matches
-        matches_file = gw_folder / "matches.csv"
-        if matches_file.exists():
-            matches_df = pd.read_csv(matches_file)
-            matches_df['gw'] = gw_num
-            all_matches.append(matches_df)
-        
-        # Load player match stats
-        player_matches_file = player_matches_path / f"GW{gw_num}" / "playermatchstats.csv"
-        if player_matches_file.exists():
-            player_matches_df = pd.read_csv(player_matches_file)
-            player_matches_df['gw'] = gw_num
-            all_player_matches.append(player_matches_df)
-    
-    matches_df = pd.concat(all_matches, ignore_index=True)
-    player_matches_df = pd.concat(all_player_matches, ignore_index=True)
-    
+    files = _discover_gameweek_files(base_path)
+    matches_df = _read_gameweek_csvs(files['matches'], 'matches', max_workers)
+    player_matches_df = _read_gameweek_csvs(files['playermatchstats'], 'playermatchstats', max_workers)
+
     print(f"Loaded {len(matches_df)} matches and {len(player_matches_df)} player-match records")
     
     # 3. Link everything together
@@ -113,7 +162,9 @@ def load_and_link_all_data(base_path="data/2024-2025"):
     # Determine if player was home or away
     player_matches_enhanced['was_home'] = (
         player_matches_enhanced['team_id'] == player_matches_enhanced['home_team']
-    )
+    ).fillna(False).astype(bool)
+    # The merges widen match_id to object; restore the compact types
+    player_matches_enhanced = apply_schema(player_matches_enhanced, 'playermatchstats')
     
     # 4. Create the main ML dataset
     # Start with FPL data as base
@@ -143,29 +194,362 @@ def load_and_link_all_data(base_path="data/2024-2025"):
     ml_dataset = ml_dataset[~ml_dataset.duplicated(subset=['element', 'gameweek', 'total_points'], keep='first')]
 
     # Sum up player total points if there are multiple entries for the same gameweek, average the other stats
-    # Group by player and gameweek
-    numeric_cols = ml_dataset.select_dtypes(include=[np.number]).columns.tolist()
-    bool_cols = ml_dataset.select_dtypes(include=['bool']).columns.tolist()
-    numeric_cols = [col for col in numeric_cols if col not in ['element', 'gameweek']]  # Remove groupby columns
-    
-    agg_dict = {col: 'mean' for col in numeric_cols}
-    agg_dict['total_points'] = 'sum'  # Sum points if multiple matches
-    # For boolean columns, take the mode (most common value)
-    for col in bool_cols:
-        agg_dict[col] = lambda x: x.mode()[0] if not x.mode().empty else x.iloc[0]
-    # Keep first occurrence of string columns
-    agg_dict['name'] = 'first'
-    agg_dict['team'] = 'first'
-    agg_dict['position'] = 'first'
-    
-    ml_dataset = ml_dataset.groupby(['element', 'gameweek']).agg(agg_dict).reset_index()
+    ml_dataset = collapse_double_gameweeks(ml_dataset)
 
     # Drop columns which leak performance information (i.e. created after the gameweek)
     # leak_cols = ['xP', 'ict_index', 'selected']
     # ml_dataset = ml_dataset.drop(columns=[col for col in leak_cols if col in ml_dataset.columns], errors='ignore')
 
-    #TODO: May need to fill in weeks where teams had blank gameweeks
+    if fill_blank_gameweeks:
+        ml_dataset = add_blank_gameweeks(ml_dataset)
 
     return ml_dataset, matches_df, player_matches_enhanced
 
 
+def collapse_double_gameweeks(ml_dataset):
+    """
+    Collapse rows of the same (element, gameweek) into one with a single Polars group_by
+
+    Numeric stats are averaged and total_points summed; boolean columns take
+    the majority value (ties resolve to False, as pandas' mode()[0] did); name,
+    team and position keep their first non-null value.
+    """
+    numeric_cols = ml_dataset.select_dtypes(include=[np.number]).columns.tolist()
+    bool_cols = ml_dataset.select_dtypes(include=['bool']).columns.tolist()
+    numeric_cols = [col for col in numeric_cols if col not in ['element', 'gameweek']]  # Remove groupby columns
+
+    keep_cols = ['element', 'gameweek'] + list(dict.fromkeys(numeric_cols + bool_cols + ['name', 'team', 'position']))
+    collapsed = _collapse_double_gameweeks(pl.from_pandas(ml_dataset[keep_cols]).lazy(), numeric_cols, bool_cols)
+    return collapsed.collect().to_pandas()
+
+
+def _collapse_double_gameweeks(frame, numeric_cols, bool_cols):
+    """
+    Group-by plan shared by both link engines
+    """
+    aggs = []
+    for col in numeric_cols:
+        aggs.append(pl.col(col).sum() if col == 'total_points' else pl.col(col).mean())
+    aggs += [(pl.col(col).cast(pl.Float64).mean() > 0.5).alias(col) for col in bool_cols]
+    aggs += [pl.col(col).drop_nulls().first() for col in ['name', 'team', 'position']]
+    return (
+        frame
+        .filter(pl.col('element').is_not_null() & pl.col('gameweek').is_not_null())
+        .group_by(['element', 'gameweek'])
+        .agg(aggs)
+        .sort(['element', 'gameweek'])
+    )
+
+
+def add_blank_gameweeks(ml_dataset, carry_cols=('name', 'team', 'position', 'value')):
+    """
+    Add explicit zero rows for gameweeks a player missed between their first and last appearance
+
+    Missing (element, gameweek) pairs come from a cross join of players and
+    gameweeks, anti-joined against the existing rows. Numeric stats are zero and
+    booleans False; `carry_cols` are forward-filled from the player's previous row.
+    """
+    df = pl.from_pandas(ml_dataset)
+    spans = df.group_by('element').agg(
+        pl.col('gameweek').min().alias('first_gw'), pl.col('gameweek').max().alias('last_gw')
+    )
+    missing = (
+        spans.join(df.select(pl.col('gameweek').unique()), how='cross')
+        .filter(pl.col('gameweek').is_between(pl.col('first_gw'), pl.col('last_gw')))
+        .select('element', 'gameweek')
+        .join(df.select('element', 'gameweek'), on=['element', 'gameweek'], how='anti')
+    )
+    if missing.is_empty():
+        return ml_dataset
+
+    carry_cols = [col for col in carry_cols if col in df.columns]
+    fills = []
+    for col, dtype in df.schema.items():
+        if col in ('element', 'gameweek') or col in carry_cols:
+            continue
+        if dtype.is_numeric():
+            fills.append(pl.lit(0, dtype=dtype).alias(col))
+        elif dtype == pl.Boolean:
+            fills.append(pl.lit(False).alias(col))
+    blank_rows = missing.with_columns(fills)
+
+    return (
+        pl.concat([df, blank_rows], how='diagonal_relaxed')
+        .select(df.columns)
+        .sort(['element', 'gameweek'])
+        .with_columns([pl.col(col).forward_fill().over('element') for col in carry_cols])
+        .to_pandas()
+    )
+
+
+def _link_with_polars(base_path, max_workers=None, fill_blank_gameweeks=False, streaming=False):
+    """
+    The same linkage as _load_and_link_all_data, expressed as one lazy Polars plan
+
+    Only the columns each step needs are carried through the joins, no
+    intermediate frame is materialised, and all three outputs come from a
+    single collect that shares their common sub-plans.
+    """
+    print("Building lazy Polars link plan...")
+    fpl_player = pl.scan_csv(f"{base_path}/gws/merged_gw.csv", infer_schema_length=10000)
+    players_master = pl.from_arrow(read_table_arrow(f"{base_path}/players/players.csv", 'players')).lazy()
+    files = _discover_gameweek_files(base_path)
+    matches = pl.from_arrow(_read_gameweek_tables(files['matches'], 'matches', max_workers)).lazy()
+    player_matches = pl.from_arrow(_read_gameweek_tables(files['playermatchstats'], 'playermatchstats', max_workers)).lazy()
+
+    # Link player matches with match data and the player's team
+    # match_id is categorical in playermatchstats but a plain string in matches
+    player_matches_enhanced = (
+        player_matches
+        .with_columns(pl.col('match_id').cast(pl.String))
+        .join(matches.select(['match_id', 'home_team', 'away_team', 'home_score', 'away_score']),
+              on='match_id', how='left', maintain_order='left')
+        .join(players_master.select(['player_id', 'team_id']), on='player_id', how='left', maintain_order='left')
+        .with_columns((pl.col('team_id') == pl.col('home_team')).fill_null(False).alias('was_home'))
+    )
+
+    # FPL data as base, then detailed match stats, then player master info
+    fpl_player = fpl_player.rename({'GW': 'gameweek'})
+    ml_dataset = fpl_player.join(
+        player_matches_enhanced, left_on=['element', 'gameweek'], right_on=['player_id', 'gw'],
+        how='left', suffix='_match', coalesce=False, maintain_order='left',
+    )
+    master_info = players_master.select(['player_id', 'player_code', 'first_name', 'second_name'])
+    ml_dataset = ml_dataset.join(
+        master_info, left_on='element', right_on='player_id',
+        how='left', suffix='_master', coalesce=False, maintain_order='left',
+    )
+    # Keep pandas' merge column order, which decides the aggregated column order
+    ml_dataset = ml_dataset.select(_merged_column_order(
+        _merged_column_order(fpl_player.collect_schema().names(),
+                             player_matches_enhanced.collect_schema().names(), '_match'),
+        master_info.collect_schema().names(), '_master',
+    ))
+
+    # Drop duplicated rows in data (caused by multiple matches in a gameweek)
+    ml_dataset = ml_dataset.unique(subset=['element', 'gameweek', 'total_points'], keep='first', maintain_order=True)
+
+    ml_schema = ml_dataset.collect_schema()
+    numeric_cols = [col for col, dtype in ml_schema.items() if dtype.is_numeric() and col not in ['element', 'gameweek']]
+    bool_cols = [col for col, dtype in ml_schema.items() if dtype == pl.Boolean]
+    # pandas only treats a column as bool when it has no missing values
+    bool_nulls = ml_dataset.select([pl.col(col).null_count() for col in bool_cols])
+    collapsed = _collapse_double_gameweeks(ml_dataset, numeric_cols, bool_cols)
+
+    collapsed, bool_nulls, matches_df, player_matches_enhanced = pl.collect_all(
+        [collapsed, bool_nulls, matches, player_matches_enhanced],
+        engine="streaming" if streaming else "auto",
+    )
+    collapsed = collapsed.drop([col for col in bool_cols if bool_nulls[col][0] > 0])
+    print(f"Loaded {matches_df.height} matches and {player_matches_enhanced.height} player-match records")
+
+    ml_dataset = collapsed.to_pandas()
+    if fill_blank_gameweeks:
+        ml_dataset = add_blank_gameweeks(ml_dataset)
+    return (ml_dataset, table_to_pandas(matches_df.to_arrow(), 'matches'),
+            table_to_pandas(player_matches_enhanced.to_arrow(), 'playermatchstats'))
+
+
+def _merged_column_order(left_cols, right_cols, suffix):
+    """
+    Column names of a pandas merge with suffixes=('', suffix), in pandas' order
+    """
+    return list(left_cols) + [f"{col}{suffix}" if col in left_cols else col for col in right_cols]
+
+
+def compare_link_engines(base_path="data/2024-2025", engines=("pandas", "polars"), streaming=False):
+    """
+    Run load_and_link_all_data once per engine, each in a fresh process, and report peak RSS and time
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(_measure_link_engine, (base_path, engine, streaming)))
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+def _measure_link_engine(base_path, engine, streaming):
+    baseline = _peak_rss_bytes()
+    start = time.perf_counter()
+    load_and_link_all_data(base_path, use_cache=False, engine=engine, streaming=streaming)
+    elapsed = time.perf_counter() - start
+    peak = _peak_rss_bytes()
+    return {
+        'engine': engine,
+        'seconds': round(elapsed, 2),
+        'peak_rss_mb': round(peak / 2**20, 1),
+        'load_rss_mb': round((peak - baseline) / 2**20, 1),
+    }
+
+
+def _peak_rss_bytes():
+    # VmHWM resets on exec; ru_maxrss survives it and would report the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _link_fingerprint(base_path, **options):
+    """
+    Hash of every input file's path, size and mtime, plus this module's source and the load options
+    """
+    files = _discover_gameweek_files(base_path)
+    sources = [Path(base_path) / "gws" / "merged_gw.csv", Path(base_path) / "players" / "players.csv"]
+    sources += [path for _, path in files['matches'] + files['playermatchstats']]
+
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    digest.update(Path(schema.__file__).read_bytes())
+    digest.update(f"pandas={pd.__version__};pyarrow={pa.__version__};{sorted(options.items())}".encode())
+    for path in sources:
+        stat = path.stat()
+        digest.update(f"{path.relative_to(base_path).as_posix()}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _write_link_cache(cache_path, frames):
+    """
+    Write the linked frames as Arrow IPC files, replacing any stale cache entries
+    """
+    cache_root = cache_path.parent
+    cache_root.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(dir=cache_root, prefix=".tmp-"))
+    try:
+        for name, df in zip(LINKED_FRAME_NAMES, frames):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(str(tmp_path / f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        # Columns of mixed Python objects can't be stored in Arrow
+        print(f"Not caching linked datasets: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return
+
+    for stale in cache_root.glob("linked-*"):
+        shutil.rmtree(stale, ignore_errors=True)
+    tmp_path.rename(cache_path)
+
+
+def _read_arrow_file(path):
+    """
+    Memory-map an Arrow IPC file; numeric columns without nulls stay backed by the mapped pages
+    """
+    # The mapping stays open for as long as the returned columns reference it
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def load_columnar_table(table_name, columns=None, seasons=None, gameweeks=None, tournaments=None,
+                        root="data/parquet", csv_root=None):
+    """
+    Load a table from the hive-partitioned Parquet dataset written by export_data.py
+
+    Only the requested columns are read, and the season / gameweek / tournament
+    filters are applied to the partition paths, so files outside the selection
+    are never opened. e.g. GW20-25, Premier League only:
+
+        load_columnar_table('playermatchstats', columns=['player_id', 'xg', 'xa'],
+                            gameweeks=range(20, 26), tournaments=['Premier League'])
+
+    The selection is checked against the season folders under `csv_root`
+    (default: the parent of `root`), and a warning lists the gameweeks that
+    have CSVs but no partition yet (see export_data.py --backfill).
+    """
+    path = Path(root) / table_name
+    discovered = ds.dataset(path, format="parquet", partitioning="hive")
+    partition_names = discovered.partitioning.schema.names
+
+    filters = []
+    for name, values in [('season', seasons), ('gameweek', gameweeks), ('tournament', tournaments)]:
+        if values is None:
+            continue
+        if name not in partition_names:
+            raise ValueError(f"'{table_name}' is not partitioned by {name}")
+        values = [values] if isinstance(values, (str, int)) else list(values)
+        filters.append(ds.field(name).isin(values))
+
+    row_filter = None
+    for expr in filters:
+        row_filter = expr if row_filter is None else row_filter & expr
+
+    dataset = _open_columnar_dataset(path, discovered, row_filter)
+    _check_columnar_coverage(table_name, discovered, seasons, gameweeks, Path(csv_root or Path(root).parent))
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+
+# CSVs that feed each gameweek partition of a table, in the 'By Gameweek' and the older per-table layout
+COLUMNAR_SOURCES = {
+    'matches': (['By Gameweek/GW{gw}/matches.csv', 'By Gameweek/GW{gw}/fixtures.csv'], ['matches/GW{gw}/matches.csv']),
+    'playermatchstats': (['By Gameweek/GW{gw}/playermatchstats.csv'], ['playermatchstats/GW{gw}/playermatchstats.csv']),
+    'playerstats': (['By Gameweek/GW{gw}/playerstats.csv'], ['playerstats/GW{gw}/playerstats.csv']),
+}
+
+
+def _check_columnar_coverage(table_name, discovered, seasons, gameweeks, csv_root):
+    """
+    Warn about gameweeks of the selection that have source CSVs but no partition in `discovered`
+    """
+    if table_name not in COLUMNAR_SOURCES or not csv_root.is_dir():
+        return
+    present = {(keys.get('season'), keys.get('gameweek')) for keys in
+               (ds.get_partition_keys(fragment.partition_expression) for fragment in discovered.get_fragments())}
+    seasons = None if seasons is None else {seasons} if isinstance(seasons, str) else set(seasons)
+    gameweeks = None if gameweeks is None else {gameweeks} if isinstance(gameweeks, int) else set(gameweeks)
+
+    missing = {}
+    for season_dir in sorted(path for path in csv_root.iterdir() if path.is_dir()):
+        if seasons is not None and season_dir.name not in seasons:
+            continue
+        layout = COLUMNAR_SOURCES[table_name][0 if (season_dir / 'By Gameweek').is_dir() else 1]
+        gw_dirs = (season_dir / Path(layout[0]).parts[0]).glob('GW*')
+        for gw in sorted(int(gw_dir.name[2:]) for gw_dir in gw_dirs if gw_dir.name[2:].isdigit()):
+            if gameweeks is not None and gw not in gameweeks:
+                continue
+            has_csv = any((season_dir / pattern.format(gw=gw)).exists() for pattern in layout)
+            if has_csv and (season_dir.name, gw) not in present:
+                missing.setdefault(season_dir.name, []).append(gw)
+    if missing:
+        listed = "; ".join(f"{season}: {_gameweek_ranges(gws)}" for season, gws in missing.items())
+        print(f"Warning: the columnar '{table_name}' dataset has no partition for gameweeks with CSVs ({listed}); "
+              f"rebuild it with python -m scripts.export_data --backfill")
+
+
+def _gameweek_ranges(gws):
+    # [1, 2, 3, 7] -> 'GW1-3, GW7'
+    runs = []
+    for gw in gws:
+        if runs and gw == runs[-1][1] + 1:
+            runs[-1][1] = gw
+        else:
+            runs.append([gw, gw])
+    return ", ".join(f"GW{start}" if start == stop else f"GW{start}-{stop}" for start, stop in runs)
+
+
+def _open_columnar_dataset(path, discovered, partition_filter=None):
+    """
+    The files of a partitioned dataset whose partition paths match `partition_filter`,
+    with one schema unified across just those files
+    """
+    # Fragments are selected on their paths alone; no footer outside the selection is read
+    files = [fragment.path for fragment in discovered.get_fragments(filter=partition_filter)]
+    partitioning = ds.partitioning(discovered.partitioning.schema, flavor="hive")
+    # Partitions are written at different times, so a column can be all-null (or
+    # integral) in one file and float in another; widen to a common type.
+    schema = pa.unify_schemas(
+        [pq.read_schema(f) for f in files] + [discovered.partitioning.schema],
+        promote_options="permissive",
+    )
+    return ds.dataset(files, format="parquet", partitioning=partitioning, partition_base_dir=str(path),
+                      schema=schema)
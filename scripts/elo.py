@@ -0,0 +1,263 @@
+import argparse
+import itertools
+import time
+import numpy as np
+import polars as pl
+from pathlib import Path
+
+from scripts.schema import read_table_arrow
+
+# Ratings are on the usual Elo scale: a 400 point gap means 10:1 expected-score odds
+ELO_SCALE = 400.0
+INITIAL_RATING = 1500.0
+DEFAULT_K = 20.0
+DEFAULT_HOME_ADVANTAGE = 60.0
+# Share of each team's distance to the league mean removed between seasons
+DEFAULT_REGRESSION = 0.25
+
+# result: win/draw/loss only; goal_diff: bigger wins move ratings more; xg: the xG share is the outcome
+MODES = ('result', 'goal_diff', 'xg')
+
+# Default elo_sweep grid (24 x 16 x 11 = 4224 combinations)
+K_GRID = np.arange(5.0, 65.0, 2.5)
+HOME_ADVANTAGE_GRID = np.arange(0.0, 160.0, 10.0)
+REGRESSION_GRID = np.linspace(0.0, 0.5, 11)
+
+MATCH_COLS = ['gameweek', 'kickoff_time', 'match_id', 'home_team', 'away_team', 'home_score', 'away_score',
+              'home_expected_goals_xg', 'away_expected_goals_xg', 'home_team_elo', 'away_team_elo']
+
+
+def load_matches(season_paths):
+    """
+    Finished matches of every season in `season_paths`, in kickoff order
+
+    A season's results are read from matches/matches.csv, or else from its
+    'By Gameweek/GWn' folders: the finished copy of a match in matches.csv
+    is preferred over its fixtures.csv row. Friendlies are left out.
+    Seasons are replayed in the order given; a 'season' column holds the
+    directory name.
+    """
+    frames = []
+    for order, season_path in enumerate(season_paths):
+        season_path = Path(season_path)
+        if (season_path / 'matches' / 'matches.csv').exists():
+            groups = [[season_path / 'matches' / 'matches.csv']]
+        else:
+            gw_dirs = sorted((path for path in (season_path / 'By Gameweek').glob('GW*') if path.is_dir()),
+                             key=lambda path: int(path.name[2:]))
+            groups = [[gw_dir / 'matches.csv', gw_dir / 'fixtures.csv'] for gw_dir in gw_dirs]
+        for files in groups:
+            for preference, path in enumerate(files):
+                if not path.exists():
+                    continue
+                table = pl.from_arrow(read_table_arrow(str(path), 'matches', compact=False))
+                frames.append(table.select([col for col in MATCH_COLS if col in table.columns])
+                              .with_columns(pl.lit(season_path.name).alias('season'),
+                                            pl.lit(order, dtype=pl.Int64).alias('_order'),
+                                            pl.lit(preference, dtype=pl.Int64).alias('_preference')))
+    if not frames:
+        raise ValueError(f"No match files found under {list(map(str, season_paths))}")
+
+    matches = pl.concat(frames, how='diagonal_relaxed')
+    # Gameweek 0 holds pre-season friendlies, often against teams outside the league
+    matches = matches.filter(pl.col('home_score').is_not_null() & pl.col('away_score').is_not_null()
+                             & (pl.col('gameweek') > 0))
+    # A fixture stays in fixtures.csv after it is played; keep the finished copy
+    matches = (matches.sort('_preference', maintain_order=True)
+               .unique('match_id', keep='first', maintain_order=True))
+    # Kickoff times are ISO strings, so they sort as text
+    matches = matches.sort(['_order', 'kickoff_time', 'gameweek'], nulls_last=True, maintain_order=True)
+    return matches.drop('_order', '_preference')
+
+
+def elo_ratings(matches, k=DEFAULT_K, home_advantage=DEFAULT_HOME_ADVANTAGE, regression=DEFAULT_REGRESSION,
+                mode='result', initial_ratings=None):
+    """
+    Replay `matches` (see load_matches) and add each side's rating before and after the match
+
+    Adds home_elo, away_elo (before kickoff), home_expected (expected score
+    of the home side, with its advantage) and home_elo_after, away_elo_after.
+    `initial_ratings` maps team codes to starting ratings; other teams start
+    at INITIAL_RATING.
+    """
+    arrays = _match_arrays(matches, mode)
+    _, record = _replay(arrays, np.array([k], dtype=np.float64), np.array([home_advantage], dtype=np.float64),
+                        np.array([regression], dtype=np.float64), _initial(arrays, initial_ratings), record=True)
+    return matches.with_columns(
+        pl.Series('home_elo', record['home'][0]),
+        pl.Series('away_elo', record['away'][0]),
+        pl.Series('home_expected', record['expected'][0]),
+        pl.Series('home_elo_after', record['home_after'][0]),
+        pl.Series('away_elo_after', record['away_after'][0]),
+    )
+
+
+def team_rating_history(ratings):
+    """
+    One row per team and match from elo_ratings output: the team's rating before and after it
+    """
+    keys = [col for col in ['season', 'gameweek', 'kickoff_time', 'match_id'] if col in ratings.columns]
+    sides = [
+        ratings.select(keys + [pl.col(f'{side}_team').alias('team'), pl.col(f'{other}_team').alias('opponent'),
+                               pl.lit(side == 'home').alias('was_home'),
+                               pl.col(f'{side}_elo').alias('elo'), pl.col(f'{side}_elo_after').alias('elo_after')])
+        .with_row_index('_match')
+        for side, other in [('home', 'away'), ('away', 'home')]
+    ]
+    return pl.concat(sides).sort(['team', '_match']).drop('_match')
+
+
+def elo_sweep(matches, k=None, home_advantage=None, regression=None, mode='result', grid=True, warmup=0,
+              initial_ratings=None):
+    """
+    Score many Elo parameter sets on `matches` in one batched replay
+
+    `k`, `home_advantage` and `regression` are sequences of values (default
+    K_GRID etc.); with `grid` every combination is tried, otherwise they are
+    taken as aligned vectors. All parameter sets advance together, one
+    block of matches at a time, as rows of a (parameter sets x teams)
+    rating array. Each set is scored by the Brier score of its pre-match
+    home expected score against the actual result (1, 0.5 or 0), skipping
+    the first `warmup` matches; a ValueError is raised when that leaves no
+    match to score. Returns the parameters and scores, best first.
+    """
+    values = [np.atleast_1d(np.asarray(grid_values if v is None else v, dtype=np.float64))
+              for v, grid_values in [(k, K_GRID), (home_advantage, HOME_ADVANTAGE_GRID),
+                                     (regression, REGRESSION_GRID)]]
+    if grid:
+        values = [np.array(v) for v in zip(*itertools.product(*values))]
+    k, home_advantage, regression = np.broadcast_arrays(*values)
+
+    arrays = _match_arrays(matches, mode)
+    scored = len(arrays['home']) - warmup
+    if scored <= 0:
+        raise ValueError(f"No matches left to score: {len(arrays['home'])} matches with warmup={warmup}")
+    start = time.perf_counter()
+    squared_error, _ = _replay(arrays, k, home_advantage, regression, _initial(arrays, initial_ratings),
+                               warmup=warmup)
+    print(f"Replayed {len(arrays['home'])} matches for {len(k)} parameter sets "
+          f"in {time.perf_counter() - start:.2f}s")
+    return pl.DataFrame({
+        'k': k, 'home_advantage': home_advantage, 'regression': regression,
+        'brier': squared_error / scored,
+    }).sort('brier')
+
+
+def _match_arrays(matches, mode):
+    """
+    Team indices, outcomes, rating multipliers and replay blocks of `matches`
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown Elo mode '{mode}', expected one of {MODES}")
+    home_codes = matches['home_team'].to_numpy()
+    away_codes = matches['away_team'].to_numpy()
+    teams, codes = np.unique(np.concatenate([home_codes, away_codes]), return_inverse=True)
+    home, away = codes[:len(matches)], codes[len(matches):]
+
+    goal_diff = (matches['home_score'].cast(pl.Float64) - matches['away_score'].cast(pl.Float64)).to_numpy()
+    result = 0.5 + 0.5 * np.sign(goal_diff)
+    outcome, multiplier = result, np.ones(len(matches))
+    if mode == 'goal_diff':
+        # World Football Elo: 1 for a draw or one-goal win, 1.5 for two goals, (11 + margin) / 8 beyond
+        margin = np.abs(goal_diff)
+        multiplier = np.where(margin <= 1, 1.0, np.where(margin == 2, 1.5, (11 + margin) / 8))
+    elif mode == 'xg':
+        home_xg = matches['home_expected_goals_xg'].cast(pl.Float64).to_numpy()
+        away_xg = matches['away_expected_goals_xg'].cast(pl.Float64).to_numpy()
+        total = home_xg + away_xg
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = home_xg / total
+        # Matches without xG fall back to the result
+        outcome = np.where(np.isfinite(share), share, result)
+
+    seasons = matches['season'].to_numpy() if 'season' in matches.columns else np.zeros(len(matches))
+    new_season = np.r_[False, seasons[1:] != seasons[:-1]]
+    return {
+        'teams': teams, 'home': home, 'away': away, 'result': result, 'outcome': outcome,
+        'multiplier': multiplier, 'new_season': new_season, 'blocks': _replay_blocks(home, away, new_season),
+    }
+
+
+def _replay_blocks(home, away, new_season):
+    """
+    Consecutive runs of matches in which no team plays twice, and which don't cross a season
+
+    Matches of a block only touch their own teams' ratings, so a whole block
+    can be updated at once with the same result as one match at a time.
+    """
+    blocks, start, busy = [], 0, set()
+    for i, (h, a) in enumerate(zip(home.tolist(), away.tolist())):
+        if h in busy or a in busy or new_season[i]:
+            blocks.append((start, i))
+            start, busy = i, set()
+        busy.update((h, a))
+    if len(home):
+        blocks.append((start, len(home)))
+    return blocks
+
+
+def _initial(arrays, initial_ratings):
+    initial = np.full(len(arrays['teams']), INITIAL_RATING)
+    for i, team in enumerate(arrays['teams'].tolist()):
+        initial[i] = (initial_ratings or {}).get(team, INITIAL_RATING)
+    return initial
+
+
+def _replay(arrays, k, home_advantage, regression, initial, warmup=0, record=False):
+    """
+    Advance one rating row per parameter set through every match; returns the summed squared error
+
+    With `record`, also returns the pre- and post-match ratings and expected
+    scores of every match, per parameter set.
+    """
+    n_sets, n_matches = len(k), len(arrays['home'])
+    ratings = np.tile(initial, (n_sets, 1))
+    seen = np.zeros(len(initial), dtype=bool)
+    k, home_advantage, keep = k[:, None], home_advantage[:, None], 1 - regression[:, None]
+    squared_error = np.zeros(n_sets)
+    record = {name: np.empty((n_sets, n_matches)) for name in
+              ['home', 'away', 'expected', 'home_after', 'away_after']} if record else None
+    scored = np.arange(n_matches) >= warmup
+
+    for start, stop in arrays['blocks']:
+        if arrays['new_season'][start] and seen.any():
+            mean = ratings[:, seen].mean(axis=1, keepdims=True)
+            ratings[:, seen] = mean + keep * (ratings[:, seen] - mean)
+
+        home, away = arrays['home'][start:stop], arrays['away'][start:stop]
+        home_rating, away_rating = ratings[:, home], ratings[:, away]
+        expected = 1 / (1 + 10 ** ((away_rating - home_rating - home_advantage) / ELO_SCALE))
+        delta = k * arrays['multiplier'][start:stop] * (arrays['outcome'][start:stop] - expected)
+        ratings[:, home] = home_rating + delta
+        ratings[:, away] = away_rating - delta
+        seen[home] = seen[away] = True
+
+        errors = (arrays['result'][start:stop] - expected) ** 2
+        squared_error += errors[:, scored[start:stop]].sum(axis=1)
+        if record is not None:
+            record['home'][:, start:stop], record['away'][:, start:stop] = home_rating, away_rating
+            record['expected'][:, start:stop] = expected
+            record['home_after'][:, start:stop] = home_rating + delta
+            record['away_after'][:, start:stop] = away_rating - delta
+    return squared_error, record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune Elo ratings on past seasons and print the current ratings.")
+    parser.add_argument('seasons', nargs='+', help="Season directories in order, e.g. data/2024-2025")
+    parser.add_argument('--mode', choices=MODES, default='result')
+    parser.add_argument('--warmup', type=int, default=100, help="Matches replayed before scoring starts")
+    args = parser.parse_args()
+
+    matches = load_matches(args.seasons)
+    sweep = elo_sweep(matches, mode=args.mode, warmup=args.warmup)
+    print(sweep.head(10))
+    best = sweep.row(0, named=True)
+    ratings = elo_ratings(matches, best['k'], best['home_advantage'], best['regression'], mode=args.mode)
+    latest = team_rating_history(ratings).group_by('team', maintain_order=True).last()
+    print(latest.select(['team', 'elo_after']).sort('elo_after', descending=True))
+
+
+if __name__ == "__main__":
+    # Run from the repository root: python -m scripts.elo data/2024-2025 data/2025-2026
+    main()
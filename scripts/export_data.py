@@ -1,9 +1,22 @@
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
 import os
+import time
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from pathlib import Path
+from urllib.parse import quote
+
+from scripts.schema import TABLE_SCHEMAS, apply_schema, read_table_csv
 
 # --- Configuration ---
 SEASON = "2025-2026"
@@ -13,17 +26,56 @@ TOURNAMENT_NAME_MAP = {
     'champions-league': 'Champions League',
     'prem': 'Premier League'
 }
-
-# --- Setup: Load Environment Variables and Connect to Supabase ---
+# High-water marks and content fingerprints from the previous run live here,
+# inside the season folder so they are committed alongside the data.
+SYNC_STATE_FILE = 'sync_state.json'
+# Content hashes of the master copies placed in every partition folder.
+FANOUT_MANIFEST_FILE = 'fanout_manifest.json'
+# Hive-partitioned Parquet copy of every table, kept alongside the CSV tree.
+PARQUET_ROOT = os.path.join('data', 'parquet')
+# Worker processes for writing the By Gameweek / By Tournament partitions (1 = in-process).
+PARTITION_WORKERS = int(os.environ.get('PARTITION_WORKERS', os.cpu_count() or 1))
+# A spawned worker takes ~1.1s to import pandas/pyarrow before its first write, and
+# a gameweek partition takes 0.1-0.15s to write, so with 4 workers the pool only wins
+# from about 15 partitions. Incremental runs (1-2 gameweeks, a few tournaments each)
+# are written in-process.
+PARALLEL_MIN_PARTITIONS = 16
+DATASET_PARTITIONS = {
+    'matches': ['season', 'gameweek', 'tournament'],
+    'playermatchstats': ['season', 'gameweek', 'tournament'],
+    'playerstats': ['season', 'gameweek'],
+    'players': ['season'],
+    'teams': ['season'],
+}
+# PostgREST caps every response at its max-rows setting (1000 by default),
+# so master tables are fetched in pages of at most this many rows.
+PAGE_SIZE = 1000
+MAX_FETCH_WORKERS = 8
+# `in_()` filters travel in the query string, so id chunks are bounded both by
+# URL length and by how many rows they bring back. Chunk sizes then adapt to
+# response times within these limits.
+MAX_FILTER_URL_CHARS = 6000
+INITIAL_CHUNK_SIZE = 50
+MAX_CHUNK_SIZE = 500
+TARGET_CHUNK_SECONDS = 2.0
+MAX_CHUNK_RETRIES = 4
+RETRY_BACKOFF_SECONDS = 0.5
+
+# --- Setup: Load Environment Variables; the Supabase client connects on first use ---
 load_dotenv()
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-
-if not url or not key:
-    print("FATAL ERROR: SUPABASE_URL and SUPABASE_KEY must be set in your environment or a .env file.")
-    exit()
-
-supabase: Client = create_client(url, key)
+supabase: Client = None
+
+def get_supabase() -> Client:
+    """The shared Supabase client, created on first use so partition worker processes never set one up."""
+    global supabase
+    if supabase is None:
+        url: str = os.environ.get("SUPABASE_URL")
+        key: str = os.environ.get("SUPABASE_KEY")
+        if not url or not key:
+            print("FATAL ERROR: SUPABASE_URL and SUPABASE_KEY must be set in your environment or a .env file.")
+            exit()
+        supabase = create_client(url, key)
+    return supabase
 
 # --- Helper Functions ---
 
@@ -39,104 +91,671 @@ def get_tournament_name_from_id(match_id: str, name_map: dict) -> str:
     # Fallback if no match is found
     return "Other"
 
-def fetch_all_records(table_name: str) -> pd.DataFrame:
-    """Fetches all records from a table without any filters."""
-    print(f"Fetching all records from master table: '{table_name}'...")
+def fetch_all_records(table_name: str, order_by: list = None, paged: bool = True, since: tuple = None) -> pd.DataFrame:
+    """
+    Fetches all records from a table, or only those at or above a `(column, value)`
+    watermark when `since` is given.
+
+    In paged mode the exact row count is used to plan `range()` pages, which are
+    fetched concurrently and copied straight into pre-sized column buffers.
+    `order_by` should name a unique key so the pages don't overlap.
+    """
+    if since:
+        print(f"Fetching records from master table: '{table_name}' with {since[0]} >= {since[1]}...")
+    else:
+        print(f"Fetching all records from master table: '{table_name}'...")
     try:
-        # A larger page size can be used for bulk fetching
-        response = supabase.table(table_name).select('*', count='exact').execute()
-        df = pd.DataFrame(response.data)
+        if not paged:
+            query = get_supabase().table(table_name).select('*', count='exact')
+            if since:
+                query = query.gte(*since)
+            df = pd.DataFrame(query.execute().data)
+        else:
+            df = _fetch_pages(table_name, order_by, since)
         print(f"  > Fetched {len(df)} total rows from '{table_name}'.")
-        return df
+        return typed_frame(df, table_name)
     except Exception as e:
         print(f"  ERROR fetching from '{table_name}': {e}")
         return pd.DataFrame()
 
+def _select_page(table_name: str, order_by: list, since: tuple, start: int, count: str = None):
+    query = get_supabase().table(table_name).select('*', count=count)
+    if since:
+        query = query.gte(*since)
+    for col in order_by or []:
+        query = query.order(col)
+    return query.range(start, start + PAGE_SIZE - 1).execute()
+
+def _fetch_pages(table_name: str, order_by: list, since: tuple = None) -> pd.DataFrame:
+    # The first page doubles as the count probe.
+    first = _select_page(table_name, order_by, since, 0, count='exact')
+    total = first.count if first.count is not None else len(first.data)
+    if not first.data:
+        return pd.DataFrame()
+
+    columns = list(first.data[0].keys())
+    buffers = {col: [None] * total for col in columns}
+    filled = [False] * total
+
+    def copy_page(start: int, rows: list):
+        # Rows added since the count was taken are picked up on the next run.
+        rows = rows[:max(total - start, 0)]
+        end = start + len(rows)
+        for col in columns:
+            buffers[col][start:end] = [row.get(col) for row in rows]
+        filled[start:end] = [True] * len(rows)
+
+    copy_page(0, first.data)
+    starts = range(PAGE_SIZE, total, PAGE_SIZE)
+    if starts:
+        with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(starts))) as pool:
+            futures = {pool.submit(_select_page, table_name, order_by, since, start): start for start in starts}
+            for future in as_completed(futures):
+                copy_page(futures[future], future.result().data)
+
+    df = pd.DataFrame(buffers)
+    if not all(filled):
+        # Rows were deleted while paging; drop the slots that were never written.
+        df = df[filled].reset_index(drop=True)
+    return df
+
 def get_latest_finished_gameweek() -> int:
     print("Querying database for the latest finished gameweek...")
     try:
-        response = supabase.table('matches').select('gameweek').eq('finished', True).execute()
+        # Only the highest finished gameweek is needed, not one row per finished match
+        response = (get_supabase().table('matches').select('gameweek').eq('finished', True)
+                    .not_.is_('gameweek', 'null').order('gameweek', desc=True).limit(1).execute())
         if not response.data:
             print("  > No finished gameweeks found. Starting fresh from Gameweek 1.")
             return 1
-        finished_gameweeks = [item['gameweek'] for item in response.data if item.get('gameweek') is not None]
-        if not finished_gameweeks:
-            print("  > No valid gameweeks in finished matches. Starting from Gameweek 1.")
-            return 1
-        latest_gw = max(finished_gameweeks)
+        latest_gw = response.data[0]['gameweek']
         print(f"  > Latest finished gameweek found: {latest_gw}. Processing from this week onwards.")
         return latest_gw
     except Exception as e:
         print(f"  ERROR: Could not fetch latest gameweek: {e}. Defaulting to Gameweek 1.")
         return 1
 
-def fetch_data_since_gameweek(table_name: str, start_gameweek: int, gameweek_col: str = 'gameweek') -> pd.DataFrame:
-    print(f"Fetching data from '{table_name}' for GW{start_gameweek} onwards...")
+def fetch_data_since_gameweek(table_name: str, start_gameweek: int, gameweek_col: str = 'gameweek',
+                              after: tuple = None) -> pd.DataFrame:
+    """
+    Fetches rows of `table_name` from `start_gameweek` onwards; with `after` = `(column, value)`,
+    only those whose column is past the value or still blank.
+    """
+    print(f"Fetching data from '{table_name}' for GW{start_gameweek} onwards"
+          + (f" with {after[0]} after {after[1]}..." if after else "..."))
     try:
-        response = supabase.table(table_name).select('*').gte(gameweek_col, start_gameweek).execute()
+        query = get_supabase().table(table_name).select('*').gte(gameweek_col, start_gameweek)
+        if after:
+            query = query.or_(f'{after[0]}.gt."{after[1]}",{after[0]}.is.null')
+        response = query.execute()
         df = pd.DataFrame(response.data)
         print(f"  > Fetched {len(df)} rows from '{table_name}'.")
-        return df
+        return typed_frame(df, table_name)
     except Exception as e:
         print(f"  ERROR fetching from '{table_name}': {e}")
         return pd.DataFrame()
 
-def fetch_data_by_ids(table_name: str, column: str, ids: list) -> pd.DataFrame:
+def fetch_data_by_ids(table_name: str, column: str, ids: list, order_by: list = None,
+                      max_workers: int = MAX_FETCH_WORKERS, max_retries: int = MAX_CHUNK_RETRIES) -> pd.DataFrame:
+    """
+    Fetches every row whose `column` is in `ids`, splitting the ids into chunks
+    that are fetched concurrently (at most `max_workers` in flight).
+
+    Each chunk is retried with exponential backoff, and a chunk whose response
+    reaches the server row limit is split and re-queued rather than truncated;
+    a single id is paged with `range()`, ordered by `order_by`. Rows come back
+    grouped in the order of `ids`, whichever chunk finished first.
+    Raises RuntimeError if any chunk is still missing once its retries are spent.
+    """
     if not ids: return pd.DataFrame()
     print(f"Fetching {len(ids)} related records from '{table_name}' using '{column}'...")
+    remaining = deque(ids)
     all_data = []
-    chunk_size = 500
-    for i in range(0, len(ids), chunk_size):
-        chunk_ids = ids[i:i + chunk_size]
-        try:
-            response = supabase.table(table_name).select('*').in_(column, chunk_ids).execute()
-            all_data.extend(response.data)
-        except Exception as e:
-            print(f"  ERROR fetching chunk from '{table_name}': {e}")
+    failed = []
+    chunk_size = INITIAL_CHUNK_SIZE
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while remaining or running:
+            while remaining and len(running) < max_workers:
+                chunk = _take_id_chunk(remaining, chunk_size)
+                running[pool.submit(_fetch_id_chunk, table_name, column, chunk, order_by, max_retries)] = chunk
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = running.pop(future)
+                try:
+                    rows, elapsed = future.result()
+                except Exception as e:
+                    print(f"  ERROR fetching chunk of {len(chunk)} ids from '{table_name}' after {max_retries} retries: {e}")
+                    failed.append(chunk)
+                    continue
+                if len(rows) >= PAGE_SIZE and len(chunk) > 1:
+                    # The response may have been cut off at the row limit; retry as two halves.
+                    half = len(chunk) // 2
+                    remaining.extendleft(reversed(chunk))
+                    chunk_size = min(chunk_size, half)
+                    continue
+                all_data.extend(rows)
+                chunk_size = _next_chunk_size(chunk_size, len(chunk), len(rows), elapsed)
+
+    if failed:
+        missing = sum(len(chunk) for chunk in failed)
+        raise RuntimeError(f"{missing} of {len(ids)} ids could not be fetched from '{table_name}' ({len(failed)} failed chunks).")
     df = pd.DataFrame(all_data)
+    if not df.empty:
+        # Chunks finish in any order; a stable sort on the id position keeps the CSVs from churning.
+        position = {id_value: i for i, id_value in enumerate(ids)}
+        df = df.sort_values(column, key=lambda col: col.map(position), kind='stable').reset_index(drop=True)
     print(f"  > Fetched {len(df)} total rows from '{table_name}'.")
-    return df
-
-def update_csv(df: pd.DataFrame, file_path: str, unique_cols: list):
+    return typed_frame(df, table_name)
+
+def _take_id_chunk(remaining: deque, chunk_size: int) -> list:
+    chunk = []
+    url_chars = 0
+    while remaining and len(chunk) < chunk_size:
+        # Each id is URL-encoded and separated by an encoded comma.
+        id_chars = len(quote(str(remaining[0]))) + 3
+        if chunk and url_chars + id_chars > MAX_FILTER_URL_CHARS:
+            break
+        chunk.append(remaining.popleft())
+        url_chars += id_chars
+    return chunk
+
+def _fetch_id_chunk(table_name: str, column: str, chunk: list, order_by: list, max_retries: int):
+    # A single id can't be split further, so its rows are paged instead.
+    start, rows, elapsed = 0, [], 0.0
+    while True:
+        page, seconds = _select_id_chunk(table_name, column, chunk, order_by, start if len(chunk) == 1 else None,
+                                         max_retries)
+        rows.extend(page)
+        elapsed += seconds
+        if len(chunk) > 1 or len(page) < PAGE_SIZE:
+            return rows, elapsed
+        start += PAGE_SIZE
+
+def _select_id_chunk(table_name: str, column: str, chunk: list, order_by: list, start: int, max_retries: int):
+    for attempt in range(max_retries + 1):
+        started = time.perf_counter()
+        try:
+            query = get_supabase().table(table_name).select('*').in_(column, chunk)
+            for col in order_by or []:
+                query = query.order(col)
+            if start is not None:
+                query = query.range(start, start + PAGE_SIZE - 1)
+            return query.execute().data, time.perf_counter() - started
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+def _next_chunk_size(chunk_size: int, n_ids: int, n_rows: int, elapsed: float) -> int:
+    """Scales the chunk size towards the target response time and row limit."""
+    if elapsed > TARGET_CHUNK_SECONDS:
+        chunk_size = int(chunk_size * TARGET_CHUNK_SECONDS / elapsed)
+    elif elapsed < TARGET_CHUNK_SECONDS / 2 and n_ids >= chunk_size:
+        chunk_size *= 2
+    if n_rows:
+        # Leave headroom below the row limit for ids that return more rows than average.
+        chunk_size = min(chunk_size, int(0.8 * PAGE_SIZE * n_ids / n_rows))
+    return max(1, min(chunk_size, MAX_CHUNK_SIZE))
+
+def typed_frame(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """Casts a fetched table to its registry types (full float precision, see scripts/schema.py)."""
+    return apply_schema(df, table_name, compact=False) if table_name in TABLE_SCHEMAS else df
+
+def update_csv(df: pd.DataFrame, file_path: str, unique_cols: list, table_name: str = None) -> pd.DataFrame:
+    """
+    Merges `df` into the CSV at `file_path`, rewriting it only if its content
+    changes, and returns the merged table. The existing file is read with the
+    registry types of `table_name` when given.
+    """
     if df.empty: return
     create_directory(os.path.dirname(file_path))
+    existing_content = None
     if os.path.exists(file_path):
-        existing_df = pd.read_csv(file_path)
+        with open(file_path, encoding='utf-8') as f:
+            existing_content = f.read()
+        if table_name:
+            existing_df = read_table_csv(existing_content.encode('utf-8'), table_name, compact=False)
+        else:
+            existing_df = pd.read_csv(io.StringIO(existing_content))
         combined_df = pd.concat([existing_df, df])
     else:
         combined_df = df
     updated_df = combined_df.drop_duplicates(subset=unique_cols, keep='last')
-    updated_df.to_csv(file_path, index=False)
+    content = updated_df.to_csv(index=False)
+    # Compare values, not text: a file written before the schema registry can hold
+    # the same data formatted differently (e.g. 54.0 for an integer column).
+    if existing_content is not None and content in (existing_content, existing_df.to_csv(index=False)):
+        return updated_df
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+    return updated_df
+
+def fan_out_csv(master_path: str, file_name: str, dirs: list, manifest: dict, season_path: str) -> int:
+    """
+    Copies the master CSV at `master_path` as `file_name` into every folder in `dirs`, reading it only once.
+
+    A destination is skipped when the manifest already records the same
+    content hash for it and the file is still there, or when the file
+    already holds the same bytes. Returns the number of files written.
+    """
+    if not os.path.exists(master_path): return 0
+    with open(master_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    written = 0
+    for dir_path in dirs:
+        file_path = os.path.join(dir_path, file_name)
+        key = Path(os.path.relpath(file_path, season_path)).as_posix()
+        if manifest.get(key) == digest and os.path.exists(file_path):
+            continue
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                if f.read() == content:
+                    manifest[key] = digest
+                    continue
+        create_directory(dir_path)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+        manifest[key] = digest
+        written += 1
+    return written
+
+def read_csv_if_exists(file_path: str, table_name: str = None) -> pd.DataFrame:
+    if not os.path.exists(file_path):
+        return pd.DataFrame()
+    return read_table_csv(file_path, table_name, compact=False) if table_name else pd.read_csv(file_path)
+
+def update_parquet(df: pd.DataFrame, table_name: str, season: str = SEASON, kept: set = None) -> int:
+    """
+    Replaces the partitions of `table_name` in the Parquet dataset that `df` covers.
+
+    `df` must hold the complete content of each partition it touches (plus the
+    partition columns other than `season`). A partition file is left alone if
+    its content is unchanged; every file `df` covers is added to `kept`.
+    Returns the number of files written.
+    """
+    if df is None or df.empty: return 0
+    partition_cols = DATASET_PARTITIONS[table_name]
+    df = df.assign(season=season)
+    written = 0
+    for values, group in df.groupby(partition_cols, sort=True):
+        values = values if isinstance(values, tuple) else (values,)
+        dir_path = _partition_dir(table_name, dict(zip(partition_cols, values)))
+        file_path = os.path.join(dir_path, 'part-0.parquet')
+        if kept is not None:
+            kept.add(os.path.normpath(file_path))
+        table = pa.Table.from_pandas(group.drop(columns=partition_cols), preserve_index=False)
+        if os.path.exists(file_path) and pq.read_table(file_path).equals(table):
+            continue
+        create_directory(dir_path)
+        pq.write_table(table, file_path)
+        written += 1
+    return written
+
+def _partition_dir(table_name: str, values: dict) -> str:
+    segments = [f"{col}={quote(str(_partition_value(value)), safe='')}" for col, value in values.items()]
+    return os.path.join(PARQUET_ROOT, table_name, *segments)
+
+def _partition_value(value):
+    # Gameweeks come back from CSVs as floats; keep the directory names integral.
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+def prune_parquet(table_name: str, values: dict, kept: set) -> int:
+    """Deletes the partition files of `table_name` under the `values` prefix that are not in `kept`."""
+    prefix = _partition_dir(table_name, values)
+    removed = 0
+    for file_path in sorted(Path(prefix).rglob('*.parquet')):
+        if os.path.normpath(str(file_path)) not in kept:
+            file_path.unlink()
+            removed += 1
+    # Drop the folders left empty, deepest first
+    for dir_path in sorted(Path(prefix).rglob('*'), key=lambda path: len(path.parts), reverse=True):
+        if dir_path.is_dir() and not any(dir_path.iterdir()):
+            dir_path.rmdir()
+    return removed
+
+def gameweek_csv_files(gw_dir: str) -> dict:
+    """The CSVs of one 'By Gameweek' folder that feed the columnar dataset."""
+    return {
+        'matches': [os.path.join(gw_dir, "matches.csv"), os.path.join(gw_dir, "fixtures.csv")],
+        'playermatchstats': os.path.join(gw_dir, "playermatchstats.csv"),
+        'playerstats': os.path.join(gw_dir, "playerstats.csv"),
+    }
+
+def update_gameweek_dataset(gw: int, files: dict, season: str = SEASON, kept: set = None) -> int:
+    """
+    Rebuilds the Parquet partitions of one gameweek from its CSVs (see gameweek_csv_files).
+
+    Partition files of the gameweek that its CSVs no longer cover are deleted.
+    """
+    kept = set() if kept is None else kept
+    matches = pd.concat([read_csv_if_exists(path, 'matches') for path in files['matches']])
+    if not matches.empty:
+        # A fixture stays in fixtures.csv after it is played; keep the finished copy.
+        matches = matches.drop_duplicates(subset=['match_id'], keep='first')
+        matches['gameweek'] = gw
+        matches['tournament'] = matches['match_id'].apply(lambda mid: get_tournament_name_from_id(mid, TOURNAMENT_NAME_MAP))
+
+    pms = read_csv_if_exists(files['playermatchstats'], 'playermatchstats')
+    if not pms.empty:
+        pms['gameweek'] = gw
+        pms['tournament'] = pms['match_id'].apply(lambda mid: get_tournament_name_from_id(mid, TOURNAMENT_NAME_MAP))
+
+    player_stats = read_csv_if_exists(files['playerstats'], 'playerstats')
+    if not player_stats.empty:
+        player_stats['gameweek'] = gw
+
+    written = (update_parquet(matches, 'matches', season, kept)
+               + update_parquet(pms, 'playermatchstats', season, kept)
+               + update_parquet(player_stats, 'playerstats', season, kept))
+    for table_name in ['matches', 'playermatchstats', 'playerstats']:
+        prune_parquet(table_name, {'season': season, 'gameweek': gw}, kept)
+    return written
+
+def season_csv_files(season_path: str) -> tuple:
+    """
+    The CSVs of a season folder that feed the columnar dataset: `({gw: files}, {table: master path})`.
+
+    Reads the 'By Gameweek' layout written by this script, or the older
+    per-table layout (matches/GWn, playermatchstats/GWn, players/, teams/).
+    """
+    gw_root = Path(season_path, "By Gameweek")
+    if gw_root.is_dir():
+        gw_dirs = [path for path in gw_root.glob("GW*") if path.is_dir()]
+        gameweeks = {int(path.name[2:]): gameweek_csv_files(str(path)) for path in gw_dirs}
+        masters = {name: os.path.join(season_path, f"{name}.csv") for name in ['players', 'teams']}
+    else:
+        gw_dirs = [path for path in Path(season_path, "matches").glob("GW*") if path.is_dir()]
+        gameweeks = {int(path.name[2:]): {
+            'matches': [str(path / "matches.csv")],
+            'playermatchstats': os.path.join(season_path, "playermatchstats", path.name, "playermatchstats.csv"),
+            'playerstats': os.path.join(season_path, "playerstats", path.name, "playerstats.csv"),
+        } for path in gw_dirs}
+        masters = {name: os.path.join(season_path, name, f"{name}.csv") for name in ['players', 'teams']}
+    return dict(sorted(gameweeks.items())), masters
+
+def backfill_dataset(season_path: str) -> int:
+    """
+    Builds the whole Parquet dataset of one season from its CSV tree.
+
+    Incremental runs only mirror the gameweeks they rewrite, so this fills in
+    the rest (and older seasons). Partition files of the season without a
+    source CSV any more are deleted. Returns the number of files written.
+    """
+    season = os.path.basename(os.path.normpath(season_path))
+    gameweeks, masters = season_csv_files(season_path)
+    print(f"Backfilling the columnar dataset of {season} from {len(gameweeks)} gameweek folders...")
+    kept = set()
+    written = sum(update_gameweek_dataset(gw, files, season, kept) for gw, files in gameweeks.items())
+    for table_name, master_path in masters.items():
+        written += update_parquet(read_csv_if_exists(master_path, table_name), table_name, season, kept)
+    removed = sum(prune_parquet(table_name, {'season': season}, kept) for table_name in DATASET_PARTITIONS)
+    print(f"  > Wrote {written} and removed {removed} partition files under '{PARQUET_ROOT}'.")
+    return written
+
+def write_gameweek_partition(season_path: str, gw: int, gw_matches: pd.DataFrame, gw_fixtures: pd.DataFrame,
+                             gw_pms: pd.DataFrame, gw_player_stats: pd.DataFrame) -> str:
+    """Saves one gameweek's event data into the 'By Gameweek' structure and the columnar dataset."""
+    gw_dir = os.path.join(season_path, "By Gameweek", f"GW{gw}")
+    update_csv(gw_matches.drop(columns=['tournament'], errors='ignore'), os.path.join(gw_dir, "matches.csv"), unique_cols=['match_id'], table_name='matches')
+    update_csv(gw_pms.drop(columns=['gameweek', 'tournament'], errors='ignore'), os.path.join(gw_dir, "playermatchstats.csv"), unique_cols=['player_id', 'match_id'], table_name='playermatchstats')
+    update_csv(gw_player_stats, os.path.join(gw_dir, "playerstats.csv"), unique_cols=['id', 'gw'], table_name='playerstats')
+    update_csv(gw_fixtures.drop(columns=['tournament'], errors='ignore'), os.path.join(gw_dir, "fixtures.csv"), unique_cols=['match_id'], table_name='matches')
+
+    # Mirror the gameweek into the columnar dataset
+    update_gameweek_dataset(gw, gameweek_csv_files(gw_dir))
+    return gw_dir
+
+def write_tournament_partition(season_path: str, gw: int, tourn: str, group: pd.DataFrame,
+                               tourn_pms: pd.DataFrame, gw_player_stats: pd.DataFrame) -> str:
+    """
+    Saves one tournament-gameweek slice into the 'By Tournament' structure.
+
+    The player stats written are those of `gw_player_stats` for every player in
+    the folder's player-match stats, including matches stored by earlier runs.
+    """
+    tourn_dir = os.path.join(season_path, "By Tournament", tourn, f"GW{gw}")
+    tourn_finished_matches = group[group['finished'] == True]
+    tourn_fixtures = group[group['finished'] == False]
+    pms_path = os.path.join(tourn_dir, "playermatchstats.csv")
+    update_csv(tourn_finished_matches.drop(columns=['tournament'], errors='ignore'), os.path.join(tourn_dir, "matches.csv"), unique_cols=['match_id'], table_name='matches')
+    all_pms = update_csv(tourn_pms.drop(columns=['gameweek', 'tournament'], errors='ignore'), pms_path, unique_cols=['player_id', 'match_id'], table_name='playermatchstats')
+    if all_pms is None:
+        all_pms = read_csv_if_exists(pms_path, 'playermatchstats')
+    if not all_pms.empty:
+        tourn_player_stats = gw_player_stats[gw_player_stats['id'].isin(all_pms['player_id'].unique())]
+        update_csv(tourn_player_stats, os.path.join(tourn_dir, "playerstats.csv"), unique_cols=['id', 'gw'], table_name='playerstats')
+    update_csv(tourn_fixtures.drop(columns=['tournament'], errors='ignore'), os.path.join(tourn_dir, "fixtures.csv"), unique_cols=['match_id'], table_name='matches')
+    return tourn_dir
+
+def _timed_call(func, args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def run_partition_writers(tasks: list, max_workers: int) -> list:
+    """
+    Runs independent partition writers, given as `(label, func, args)`, on a process pool.
+
+    Every task writes its own folder, so the files produced don't depend on
+    scheduling. Fewer than PARALLEL_MIN_PARTITIONS tasks are written
+    in-process. Results come back in task order, followed by a timing report.
+    """
+    started = time.perf_counter()
+    if len(tasks) < PARALLEL_MIN_PARTITIONS:
+        max_workers = 1
+    if max_workers <= 1 or len(tasks) <= 1:
+        outcomes = [_timed_call(func, args) for _, func, args in tasks]
+    else:
+        # spawn, because forking after the fetch thread pools and pyarrow's threads have run can deadlock
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), mp_context=ctx) as pool:
+            futures = [pool.submit(_timed_call, func, args) for _, func, args in tasks]
+            outcomes = [future.result() for future in futures]
+
+    print(f"  > Wrote {len(tasks)} partitions with {max(1, min(max_workers, len(tasks)))} worker(s):")
+    for (label, _, _), (_, elapsed) in zip(tasks, outcomes):
+        print(f"    - {label}: {elapsed:.2f}s")
+    print(f"  > Partition wall-clock: {time.perf_counter() - started:.2f}s")
+    return [result for result, _ in outcomes]
+
+def load_json(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_json(path: str, data: dict):
+    content = json.dumps(data, indent=2, sort_keys=True) + '\n'
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == content:
+                return
+    create_directory(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(content)
+
+def frame_fingerprint(df: pd.DataFrame, sort_cols: list):
+    """Content hash of a fetched table, independent of the order rows arrived in."""
+    if df.empty:
+        return None
+    df = df.sort_values(sort_cols).reset_index(drop=True)
+    return hashlib.sha256(df.to_csv(index=False).encode('utf-8')).hexdigest()
+
+def fetch_player_stats_since(start_gameweek: int, state: dict, master_path: str) -> tuple:
+    """
+    Fetches `playerstats` rows from the stored gameweek watermark onwards.
+
+    The watermark is inclusive because the rows of the latest gameweek keep
+    changing, and it never goes past `start_gameweek` so every partition this
+    run rewrites gets fresh stats. Without a watermark or a local master file
+    the whole table is fetched. Returns the rows and the gameweek from which
+    they are compared with the previous sync.
+    """
+    watermark = state.get('playerstats', {}).get('watermark')
+    if watermark is None or not os.path.exists(master_path):
+        df = fetch_all_records('playerstats', order_by=['id', 'gw'])
+        # The gameweek the next run will start at, so an unchanged table gives the same sync state
+        since_gw = min(int(df['gw'].max()), int(start_gameweek)) if not df.empty else None
+        return df, since_gw
+    since_gw = min(int(watermark), int(start_gameweek))
+    return fetch_all_records('playerstats', order_by=['id', 'gw'], since=('gw', since_gw)), since_gw
+
+def run_fetch_plan(plan: dict) -> dict:
+    """
+    Runs a dependency graph of fetches on a thread pool and returns their results.
+
+    `plan` maps a name to `(func, deps)`; `func` is called with the results of
+    `deps` (in order) as soon as they are all available, so independent
+    requests overlap. Per-request latency is printed once everything is done.
+    """
+    results, timings = {}, {}
+    pending = dict(plan)
+
+    def timed(name, func, args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+        running = {}
+        while pending or running:
+            for name, (func, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    running[pool.submit(timed, name, func, [results[dep] for dep in deps])] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Fetch plan has unresolvable dependencies: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    print("\n--- Fetch latency ---")
+    for name in plan:
+        print(f"  > {name}: {timings[name]:.2f}s")
+    print(f"  > Total wall-clock: {time.perf_counter() - started:.2f}s")
+    return results
+
+def fetch_recent_matches(start_gameweek: int, state: dict) -> tuple:
+    """
+    Fetches `matches` from `start_gameweek` onwards that are past the stored kickoff watermark.
+
+    The table has no modified timestamp. A match stops changing once it is
+    finished and its player stats are processed, so the watermark is the
+    kickoff time up to which every match is in that state. Fixtures after it
+    have no usable mark and are fetched on every run. Returns the rows and
+    the new watermark.
+    """
+    watermark = state.get('matches', {}).get('watermark')
+    matches_df = fetch_data_since_gameweek('matches', start_gameweek,
+                                           after=('kickoff_time', watermark) if watermark else None)
+    # Remove unwanted columns right after fetching
+    matches_df = matches_df.drop(columns=['match_url', 'fotmob_id'], errors='ignore')
+    return matches_df, matches_watermark(matches_df, watermark)
+
+def matches_watermark(matches_df: pd.DataFrame, watermark: str = None) -> str:
+    """Latest kickoff time up to which every fetched match is finished with its player stats processed."""
+    if matches_df.empty or 'player_stats_processed' not in matches_df.columns:
+        return watermark
+    settled = ((matches_df['finished'] == True) & (matches_df['player_stats_processed'] == True)).fillna(False)
+    # Matches sharing a kickoff time only count once all of them are settled
+    by_kickoff = settled.groupby(matches_df['kickoff_time'].fillna('~')).all().sort_index()
+    prefix = by_kickoff.cumprod().astype(bool)
+    prefix = prefix[prefix & (prefix.index != '~')]
+    return str(prefix.index[-1]) if len(prefix) else watermark
+
+def past_watermark(matches_df: pd.DataFrame, watermark: str = None) -> pd.DataFrame:
+    """The matches a run with `watermark` fetches: kicking off after it or without a kickoff time."""
+    if matches_df.empty or watermark is None:
+        return matches_df
+    return matches_df[matches_df['kickoff_time'].isna() | (matches_df['kickoff_time'] > watermark)]
+
+def fetch_finished_player_match_stats(matches_df: pd.DataFrame) -> pd.DataFrame:
+    # Fetch player-match stats only for the finished matches. They have no mark of their own;
+    # matches behind the matches watermark already had theirs stored, so they are not asked for again.
+    if matches_df.empty:
+        return pd.DataFrame()
+    finished_ids = matches_df.loc[matches_df['finished'] == True, 'match_id'].unique().tolist()
+    return fetch_data_by_ids('playermatchstats', 'match_id', finished_ids, order_by=['player_id'])
 
 
-def main():
+def main(full_refresh: bool = False, partition_workers: int = PARTITION_WORKERS):
     """Main function to run the entire data export and processing pipeline."""
     season_path = os.path.join('data', SEASON)
     print(f"--- Starting Automated Data Update for Season {SEASON} ---")
     print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}")
 
-    # --- Fetch ALL master data first. ---
-    all_players_df = fetch_all_records('players')
-    all_teams_df = fetch_all_records('teams')
-    all_player_stats_df = fetch_all_records('playerstats')
-
-    # --- Determine recent gameweeks and fetch ALL recent matches (finished and not finished) ---
-    start_gameweek = get_latest_finished_gameweek()
-    matches_df = fetch_data_since_gameweek('matches', start_gameweek)
-    
-    # NEW: Remove unwanted columns right after fetching
-    matches_df = matches_df.drop(columns=['match_url', 'fotmob_id'], errors='ignore')
+    state = {} if full_refresh else load_json(os.path.join(season_path, SYNC_STATE_FILE))
+    player_stats_master_path = os.path.join(season_path, 'playerstats.csv')
+
+    # --- Fetch master data and recent matches concurrently. ---
+    # playerstats waits for the latest-gameweek probe to bound its watermark, and
+    # the player-match stats need the finished match ids.
+    # players and teams have no modified timestamp, and an id mark would only find
+    # new rows, not changed ones (transfers, positions, ratings). Both fit in a
+    # single page, so they are fetched in full and compared by content hash.
+    fetched = run_fetch_plan({
+        'players': (lambda: fetch_all_records('players', order_by=['player_id']), []),
+        'teams': (lambda: fetch_all_records('teams', order_by=['id']), []),
+        'start_gameweek': (get_latest_finished_gameweek, []),
+        'playerstats': (lambda start_gameweek: fetch_player_stats_since(start_gameweek, state, player_stats_master_path), ['start_gameweek']),
+        'matches': (lambda start_gameweek: fetch_recent_matches(start_gameweek, state), ['start_gameweek']),
+        'playermatchstats': (lambda matches: fetch_finished_player_match_stats(matches[0]), ['matches']),
+    })
+    all_players_df = fetched['players']
+    all_teams_df = fetched['teams']
+    all_player_stats_df, player_stats_since = fetched['playerstats']
+    matches_df, matches_mark = fetched['matches']
+    player_match_stats_df = fetched['playermatchstats']
+
+    # --- Compare against the previous sync and stop early if nothing changed. ---
+    # Only rows the next run fetches again are hashed, so an unchanged source gives the same state.
+    unsettled = past_watermark(matches_df, matches_mark)
+    unsettled_stats = (player_match_stats_df[player_match_stats_df['match_id'].isin(unsettled['match_id'])]
+                       if not player_match_stats_df.empty else player_match_stats_df)
+    new_state = {
+        'players': {'hash': frame_fingerprint(all_players_df, ['player_id'])},
+        'teams': {'hash': frame_fingerprint(all_teams_df, ['id'])},
+        'playerstats': {
+            'since': player_stats_since,
+            'hash': frame_fingerprint(all_player_stats_df[all_player_stats_df['gw'] >= player_stats_since]
+                                      if player_stats_since is not None else all_player_stats_df, ['id', 'gw']),
+            'watermark': int(all_player_stats_df['gw'].max()) if not all_player_stats_df.empty else state.get('playerstats', {}).get('watermark'),
+        },
+        'matches': {'watermark': matches_mark, 'hash': frame_fingerprint(unsettled, ['match_id'])},
+        'playermatchstats': {'hash': frame_fingerprint(unsettled_stats, ['match_id', 'player_id'])},
+    }
+    if new_state == state:
+        print("\nNo changes since the last sync. Nothing to write.")
+        return
 
-    # Exit early if there are no matches at all to process.
-    if matches_df.empty:
-        print("\nNo recent match data found (neither finished nor upcoming). Updating master files only.")
-        update_csv(all_players_df, os.path.join(season_path, 'players.csv'), unique_cols=['player_id'])
-        update_csv(all_teams_df, os.path.join(season_path, 'teams.csv'), unique_cols=['id'])
-        update_csv(all_player_stats_df, os.path.join(season_path, 'playerstats.csv'), unique_cols=['id', 'gw'])
+    # Matches behind the kickoff watermark aren't fetched again, but their gameweeks'
+    # player stats still are, so those gameweeks are rewritten too.
+    partition_gws = set(matches_df['gameweek'].dropna().astype(int)) if not matches_df.empty else set()
+    if player_stats_since is not None:
+        partition_gws |= set(all_player_stats_df.loc[all_player_stats_df['gw'] >= player_stats_since, 'gw'].astype(int))
+    all_gws = sorted(partition_gws)
+
+    # Exit early if there are no gameweeks at all to process.
+    if not all_gws:
+        print("\nNo recent match data or player stats found (neither finished nor upcoming). Updating master files only.")
+        update_csv(all_players_df, os.path.join(season_path, 'players.csv'), unique_cols=['player_id'], table_name='players')
+        update_csv(all_teams_df, os.path.join(season_path, 'teams.csv'), unique_cols=['id'], table_name='teams')
+        update_csv(all_player_stats_df, os.path.join(season_path, 'playerstats.csv'), unique_cols=['id', 'gw'], table_name='playerstats')
+        update_parquet(read_csv_if_exists(os.path.join(season_path, 'players.csv'), 'players'), 'players')
+        update_parquet(read_csv_if_exists(os.path.join(season_path, 'teams.csv'), 'teams'), 'teams')
+        save_json(os.path.join(season_path, SYNC_STATE_FILE), new_state)
         print("\n--- Master files updated. Process complete. ---")
         return
 
     print("\n--- Pre-processing data for saving ---")
+    if matches_df.empty:
+        # Every match is behind the watermark; keep the columns the partition split uses.
+        matches_df = pd.DataFrame(columns=['match_id', 'gameweek', 'finished'])
 
     # Use the helper function to correctly assign the full tournament name
     matches_df['tournament'] = matches_df['match_id'].apply(lambda mid: get_tournament_name_from_id(mid, TOURNAMENT_NAME_MAP))
@@ -148,85 +767,88 @@ def main():
     print(f"  > Found {len(finished_matches_df)} newly finished matches to process.")
     print(f"  > Found {len(fixtures_df)} upcoming fixtures to record.")
 
-    # Fetch player-match stats only for the finished matches.
-    relevant_match_ids = finished_matches_df['match_id'].unique().tolist()
-    player_match_stats_df = fetch_data_by_ids('playermatchstats', 'match_id', relevant_match_ids)
-
     # Add helper columns to player stats
     if not player_match_stats_df.empty:
         # Create a map for tournament names from the main matches_df for efficiency
         match_id_to_tourn_map = matches_df.set_index('match_id')['tournament'].to_dict()
         player_match_stats_df['gameweek'] = player_match_stats_df['match_id'].map(finished_matches_df.set_index('match_id')['gameweek'])
         player_match_stats_df['tournament'] = player_match_stats_df['match_id'].map(match_id_to_tourn_map)
+    else:
+        # Every finished match is behind the watermark; keep the columns the partition split uses.
+        player_match_stats_df = pd.DataFrame(columns=['player_id', 'match_id', 'gameweek', 'tournament'])
 
-    print("\n--- Saving data into directory structures ---")
+    # --- Update the master files first; partitions receive copies of the merged tables. ---
+    print("\n--- Updating master data files ---")
+    players_master_df = update_csv(all_players_df, os.path.join(season_path, 'players.csv'), unique_cols=['player_id'], table_name='players')
+    print("  > Master 'players.csv' updated.")
 
-    # --- 1. Save data into the 'By Gameweek' structure ---
-    # Loop over all gameweeks present in the fetched data, not just finished ones.
-    all_gws = sorted(matches_df['gameweek'].dropna().unique())
-    for gw in all_gws:
-        gw = int(gw)
-        gw_dir = os.path.join(season_path, "By Gameweek", f"GW{gw}")
-
-        # Filter event-based data for this specific gameweek
-        gw_matches = finished_matches_df[finished_matches_df['gameweek'] == gw]
-        gw_pms = player_match_stats_df[player_match_stats_df['gameweek'] == gw]
-        gw_player_stats = all_player_stats_df[all_player_stats_df['gw'] == gw]
-        gw_fixtures = fixtures_df[fixtures_df['gameweek'] == gw]
-
-        # Save filtered event data
-        update_csv(gw_matches.drop(columns=['tournament'], errors='ignore'), os.path.join(gw_dir, "matches.csv"), unique_cols=['match_id'])
-        update_csv(gw_pms.drop(columns=['gameweek', 'tournament'], errors='ignore'), os.path.join(gw_dir, "playermatchstats.csv"), unique_cols=['player_id', 'match_id'])
-        update_csv(gw_player_stats, os.path.join(gw_dir, "playerstats.csv"), unique_cols=['id', 'gw'])
-        update_csv(gw_fixtures.drop(columns=['tournament'], errors='ignore'), os.path.join(gw_dir, "fixtures.csv"), unique_cols=['match_id'])
-
-        # Save the COMPLETE master lists for players and teams for full context
-        update_csv(all_players_df, os.path.join(gw_dir, "players.csv"), unique_cols=['player_id'])
-        update_csv(all_teams_df, os.path.join(gw_dir, "teams.csv"), unique_cols=['id'])
-
-    print("  > Processed all data into 'By Gameweek' structure.")
-
-    # --- 2. Save data into the 'By Tournament' structure ---
-    # Group by the main matches_df to include folders for gameweeks that only have fixtures.
-    for (gw, tourn), group in matches_df.groupby(['gameweek', 'tournament']):
-        gw, tourn = int(gw), str(tourn)
-        tourn_dir = os.path.join(season_path, "By Tournament", tourn, f"GW{gw}")
-
-        # Filter event-based data for this specific tournament-gameweek slice
-        tourn_finished_matches = group[group['finished'] == True]
-        tourn_fixtures = group[group['finished'] == False]
-
-        tourn_match_ids = tourn_finished_matches['match_id'].unique()
-        tourn_pms = player_match_stats_df[player_match_stats_df['match_id'].isin(tourn_match_ids)]
+    teams_master_df = update_csv(all_teams_df, os.path.join(season_path, 'teams.csv'), unique_cols=['id'], table_name='teams')
+    print("  > Master 'teams.csv' updated.")
 
-        tourn_player_ids = tourn_pms['player_id'].unique()
-        tourn_player_stats = all_player_stats_df[(all_player_stats_df['id'].isin(tourn_player_ids)) & (all_player_stats_df['gw'] == gw)]
+    update_csv(all_player_stats_df, player_stats_master_path, unique_cols=['id', 'gw'], table_name='playerstats')
+    print("  > Master 'playerstats.csv' updated.")
 
-        # Save filtered event data
-        update_csv(tourn_finished_matches.drop(columns=['tournament'], errors='ignore'), os.path.join(tourn_dir, "matches.csv"), unique_cols=['match_id'])
-        update_csv(tourn_pms.drop(columns=['gameweek', 'tournament'], errors='ignore'), os.path.join(tourn_dir, "playermatchstats.csv"), unique_cols=['player_id', 'match_id'])
-        update_csv(tourn_player_stats, os.path.join(tourn_dir, "playerstats.csv"), unique_cols=['id', 'gw'])
-        update_csv(tourn_fixtures.drop(columns=['tournament'], errors='ignore'), os.path.join(tourn_dir, "fixtures.csv"), unique_cols=['match_id'])
+    print("\n--- Saving data into directory structures ---")
+    tasks = []
 
-        # Save the COMPLETE master lists for players and teams for full context
-        update_csv(all_players_df, os.path.join(tourn_dir, "players.csv"), unique_cols=['player_id'])
-        update_csv(all_teams_df, os.path.join(tourn_dir, "teams.csv"), unique_cols=['id'])
+    # --- 1. 'By Gameweek' structure ---
+    # Cover all gameweeks present in the fetched data, not just finished ones.
+    for gw in all_gws:
+        tasks.append((f"By Gameweek/GW{gw}", write_gameweek_partition, (
+            season_path, gw,
+            finished_matches_df[finished_matches_df['gameweek'] == gw],
+            fixtures_df[fixtures_df['gameweek'] == gw],
+            player_match_stats_df[player_match_stats_df['gameweek'] == gw],
+            all_player_stats_df[all_player_stats_df['gw'] == gw],
+        )))
+
+    # --- 2. 'By Tournament' structure ---
+    # Group by the main matches_df to include folders for gameweeks that only have fixtures,
+    # plus the folders already on disk for the rewritten gameweeks.
+    tourn_groups = {(int(gw), str(tourn)): group for (gw, tourn), group in matches_df.groupby(['gameweek', 'tournament'])}
+    for gw in all_gws:
+        for tourn_dir in Path(season_path, "By Tournament").glob(f"*/GW{gw}"):
+            tourn_groups.setdefault((gw, tourn_dir.parent.name), matches_df.iloc[:0])
+    for (gw, tourn), group in sorted(tourn_groups.items()):
+        tourn_match_ids = group.loc[group['finished'] == True, 'match_id'].unique()
+        tourn_pms = player_match_stats_df[player_match_stats_df['match_id'].isin(tourn_match_ids)]
+        tasks.append((f"By Tournament/{tourn}/GW{gw}", write_tournament_partition, (
+            season_path, gw, tourn, group, tourn_pms, all_player_stats_df[all_player_stats_df['gw'] == gw],
+        )))
 
-    print("  > Processed all data into 'By Tournament' structure.")
+    partition_dirs = run_partition_writers(tasks, partition_workers)
+    print("  > Processed all data into 'By Gameweek' and 'By Tournament' structures.")
 
-    # --- 3. Update Master Files in the root season folder ---
-    print("\n--- Updating master data files ---")
-    update_csv(all_players_df, os.path.join(season_path, 'players.csv'), unique_cols=['player_id'])
-    print("  > Master 'players.csv' updated.")
+    # --- 3. Place the COMPLETE master lists for players and teams in every partition for full context ---
+    manifest_path = os.path.join(season_path, FANOUT_MANIFEST_FILE)
+    manifest = load_json(manifest_path)
+    written = fan_out_csv(os.path.join(season_path, 'players.csv'), "players.csv", partition_dirs, manifest, season_path)
+    written += fan_out_csv(os.path.join(season_path, 'teams.csv'), "teams.csv", partition_dirs, manifest, season_path)
+    save_json(manifest_path, manifest)
+    print(f"  > Wrote {written} master copies across {len(partition_dirs)} partition folders.")
 
-    update_csv(all_teams_df, os.path.join(season_path, 'teams.csv'), unique_cols=['id'])
-    print("  > Master 'teams.csv' updated.")
+    update_parquet(players_master_df, 'players')
+    update_parquet(teams_master_df, 'teams')
+    print(f"  > Columnar dataset updated under '{PARQUET_ROOT}'.")
 
-    update_csv(all_player_stats_df, os.path.join(season_path, 'playerstats.csv'), unique_cols=['id', 'gw'])
-    print("  > Master 'playerstats.csv' updated.")
+    save_json(os.path.join(season_path, SYNC_STATE_FILE), new_state)
 
     print("\n--- Automated data update process completed successfully! ---")
 
 
 if __name__ == "__main__":
-    main()
+    # Run from the repository root: python -m scripts.export_data
+    parser = argparse.ArgumentParser(description="Export FPL data from Supabase into the season folders.")
+    parser.add_argument('--full-refresh', action='store_true',
+                        help="Ignore the stored sync state and re-download every master table.")
+    parser.add_argument('--partition-workers', type=int, default=PARTITION_WORKERS,
+                        help="Worker processes for writing partition folders (1 writes them in-process).")
+    parser.add_argument('--backfill', nargs='+', metavar='SEASON_DIR',
+                        help="Rebuild the columnar dataset of these season folders from their CSVs instead of syncing, "
+                             "e.g. data/2024-2025 data/2025-2026.")
+    args = parser.parse_args()
+    if args.backfill:
+        for season_path in args.backfill:
+            backfill_dataset(season_path)
+    else:
+        main(full_refresh=args.full_refresh, partition_workers=args.partition_workers)
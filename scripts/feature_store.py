@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+import pandas as pd
+import polars as pl
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from scripts.data_curate import (
+    FEATURES_TO_ROLL, create_ml_feature_set, feature_column_hashes, feature_definition_hash,
+    per_row_feature_columns, rolled_feature_of, rolling_column_names, rolling_feature_columns,
+)
+
+# Materialized output of create_ml_feature_set:
+#   feature_store/season=<season>/gameweek=<n>/part-0.parquet
+#   feature_store/manifest.json  (definition hash of every stored column, per season)
+FEATURE_STORE_ROOT = 'feature_store'
+MANIFEST_FILE = 'manifest.json'
+KEY_COLS = ['element', 'gameweek']
+
+
+def materialize_features(ml_dataset, season, root=FEATURE_STORE_ROOT):
+    """
+    Save the feature set of `ml_dataset` for `season` in the feature store
+
+    If the source rows are unchanged since the last call, only columns whose
+    definition hash differs from the stored one are recomputed (e.g. a new
+    rolled feature or window) and merged into the stored partitions.
+    Otherwise the whole set is rebuilt. Partition files whose content is
+    unchanged are not rewritten. Returns the names of the recomputed columns.
+    """
+    manifest = _load_manifest(root)
+    entry = manifest.get(season, {})
+    source = _source_fingerprint(ml_dataset)
+
+    base = per_row_feature_columns(ml_dataset)
+    columns = base.columns + rolling_column_names()
+    hashes = feature_column_hashes(columns)
+    stored_hashes = entry.get('columns', {})
+    gameweeks = sorted(base['gameweek'].unique().to_list())
+
+    if entry.get('source') != source or not _has_partitions(root, season, gameweeks):
+        print(f"Building all {len(columns)} feature columns for {season}...")
+        features = create_ml_feature_set(ml_dataset)
+        recomputed = columns
+    else:
+        recomputed = [col for col in columns if stored_hashes.get(col) != hashes[col]]
+        if not recomputed and list(stored_hashes) == columns:
+            print(f"Feature store for {season} is up to date.")
+            return []
+        print(f"Recomputing {len(recomputed)} of {len(columns)} feature columns for {season}...")
+        features = _merge_stale_columns(ml_dataset, base, _read_season(root, season), columns, recomputed)
+
+    written = _write_partitions(features, root, season, gameweeks)
+    manifest[season] = {'definition': feature_definition_hash(), 'source': source, 'columns': hashes}
+    _save_manifest(root, manifest)
+    print(f"  > Wrote {written} of {len(gameweeks)} gameweek partitions under '{root}'.")
+    return recomputed
+
+
+def load_features(season, gameweeks=None, columns=None, root=FEATURE_STORE_ROOT):
+    """
+    Read stored features for `season` straight from disk
+
+    Only the partitions of `gameweeks` (any iterable, default all) are opened
+    and only `columns` (default all, the keys are always included) are read.
+    Rows come back sorted by element and gameweek, like create_ml_feature_set.
+    Raises ValueError if a requested column was stored under a different
+    definition than the current one; run materialize_features first.
+    """
+    entry = _load_manifest(root).get(season)
+    if entry is None:
+        raise ValueError(f"No features stored for {season} under '{root}'")
+    stored = list(entry['columns'])
+    columns = stored if columns is None else KEY_COLS + [col for col in columns if col not in KEY_COLS]
+
+    current = feature_column_hashes(columns)
+    stale = [col for col in columns if entry['columns'].get(col) != current[col]]
+    if stale:
+        raise ValueError(f"{len(stale)} requested feature columns are missing or stale in the store "
+                         f"(e.g. {stale[:3]}); run materialize_features first")
+
+    files = _partition_files(root, season, gameweeks)
+    if not files:
+        return pl.DataFrame(schema={col: pl.Float64 for col in columns})
+    # Same row order as create_ml_feature_set
+    return pl.scan_parquet(files).select(columns).sort(KEY_COLS).collect()
+
+
+def _merge_stale_columns(ml_dataset, base, stored, columns, stale):
+    """
+    Combine up-to-date stored columns with freshly computed stale ones, in create_ml_feature_set order
+    """
+    stale_features = [feat for feat in FEATURES_TO_ROLL if feat in {rolled_feature_of(col) for col in stale}]
+    parts = [
+        stored.select(KEY_COLS + [col for col in columns if col not in stale and col not in KEY_COLS and col in stored.columns]),
+        base.select(KEY_COLS + [col for col in stale if col in base.columns and col not in KEY_COLS]),
+    ]
+    if stale_features:
+        fresh = rolling_feature_columns(ml_dataset, stale_features)
+        parts.append(fresh.select(KEY_COLS + [col for col in stale if col in fresh.columns and col not in KEY_COLS]))
+
+    features = base.select(KEY_COLS)
+    for part in parts:
+        features = features.join(part, on=KEY_COLS, how='left', maintain_order='left')
+    return features.select(columns)
+
+
+def _write_partitions(features, root, season, gameweeks):
+    season_dir = Path(root) / f"season={season}"
+    metadata = {b'feature_definition': feature_definition_hash().encode()}
+    written = 0
+    for (gw,), group in features.partition_by('gameweek', as_dict=True, maintain_order=True).items():
+        file_path = season_dir / f"gameweek={gw}" / 'part-0.parquet'
+        table = group.to_arrow().replace_schema_metadata(metadata)
+        # The schema check is cheap and rules out a full read when columns were added
+        if (file_path.exists() and pq.read_schema(file_path).equals(table.schema)
+                and pq.read_table(file_path).equals(table)):
+            continue
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, file_path)
+        written += 1
+
+    # Gameweeks that are no longer in the source
+    for gw_dir in season_dir.glob('gameweek=*'):
+        if int(gw_dir.name.split('=', 1)[1]) not in gameweeks:
+            shutil.rmtree(gw_dir)
+    return written
+
+
+def _read_season(root, season):
+    return pl.read_parquet(_partition_files(root, season))
+
+
+def _partition_files(root, season, gameweeks=None):
+    season_dir = Path(root) / f"season={season}"
+    wanted = None if gameweeks is None else {int(gw) for gw in gameweeks}
+    files = []
+    for gw_dir in season_dir.glob('gameweek=*'):
+        gw = int(gw_dir.name.split('=', 1)[1])
+        if (wanted is None or gw in wanted) and (gw_dir / 'part-0.parquet').exists():
+            files.append((gw, str(gw_dir / 'part-0.parquet')))
+    return [path for _, path in sorted(files)]
+
+
+def _has_partitions(root, season, gameweeks):
+    return len(_partition_files(root, season, gameweeks)) == len(gameweeks)
+
+
+def _source_fingerprint(ml_dataset):
+    # Content hash of the rows the features are computed from
+    digest = hashlib.sha256(pd.util.hash_pandas_object(ml_dataset, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([[col, str(dtype)] for col, dtype in ml_dataset.dtypes.items()]).encode())
+    return digest.hexdigest()[:16]
+
+
+def _load_manifest(root):
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(root, manifest):
+    os.makedirs(root, exist_ok=True)
+    # Column order is meaningful, so keys are kept in insertion order
+    with open(os.path.join(root, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
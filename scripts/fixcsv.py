@@ -1,37 +1,38 @@
+import argparse
 import os
-import pandas as pd
-from pathlib import Path
-
-# Utility function to create directories
-def create_directory(path):
-    Path(path).mkdir(parents=True, exist_ok=True)
+from scripts.partitioning import (
+    BACKFILL, add_mode_arguments, create_directory, load_manifest, save_manifest, write_partitions,
+)
+from scripts.schema import read_table_csv
 
 # Update matches for all gameweeks
-def update_matches_by_gameweek(season_path):
+def update_matches_by_gameweek(season_path, mode=BACKFILL):
     """
     Processes all gameweeks in matches_df and saves matches per gameweek.
     """
     matches_path = os.path.join(season_path, 'matches', 'matches.csv')
-    matches_df = pd.read_csv(matches_path)
+    matches_df = read_table_csv(matches_path, 'matches', compact=False)
     gw_base_path = os.path.join(season_path, 'matches', 'gameweeks')
     create_directory(gw_base_path)
 
-    for gw in matches_df['gameweek'].unique():
-        gw_path = os.path.join(gw_base_path, f'GW{gw}')
-        create_directory(gw_path)
-        gw_matches = matches_df[matches_df['gameweek'] == gw]
-        gw_matches.to_csv(os.path.join(gw_path, 'matches.csv'), index=False)
-        print(f"Updated GW{gw} with {len(gw_matches)} matches")
+    manifest_path = os.path.join(gw_base_path, 'partition_manifest.json')
+    manifest = load_manifest(manifest_path)
+    write_partitions(
+        matches_df, 'gameweek',
+        lambda gw: os.path.join(gw_base_path, f'GW{int(gw)}', 'matches.csv'),
+        unique_cols=['match_id'], mode=mode, manifest=manifest, label='matches', table_name='matches',
+    )
+    save_manifest(manifest_path, manifest)
 
     return matches_df
 
 # Update player match stats for all gameweeks
-def update_player_match_stats(season_path, matches_df):
+def update_player_match_stats(season_path, matches_df, mode=BACKFILL):
     """
     Processes all gameweeks in player match stats, mapping match_id to gameweek.
     """
     stats_path = os.path.join(season_path, 'playermatchstats', 'playermatchstats.csv')
-    stats_df = pd.read_csv(stats_path)
+    stats_df = read_table_csv(stats_path, 'playermatchstats', compact=False)
     gw_base_path = os.path.join(season_path, 'playermatchstats', 'gameweeks')
     create_directory(gw_base_path)
 
@@ -46,28 +47,33 @@ def update_player_match_stats(season_path, matches_df):
     total_stats = len(stats_df)
     print(f"Found {total_stats} player match stats across all gameweeks")
 
-    for gw in stats_df['gameweek'].unique():
-        if pd.isna(gw):
-            continue  # Skip if gameweek is missing
-        gw_path = os.path.join(gw_base_path, f'GW{gw}')
-        create_directory(gw_path)
-        gw_stats = stats_df[stats_df['gameweek'] == gw]
-        gw_stats.to_csv(os.path.join(gw_path, 'playermatchstats.csv'), index=False)
-        print(f"Updated GW{gw} with {len(gw_stats)} player match stats")
+    # Stats without a gameweek are skipped by the partitioner
+    manifest_path = os.path.join(gw_base_path, 'partition_manifest.json')
+    manifest = load_manifest(manifest_path)
+    write_partitions(
+        stats_df, 'gameweek',
+        lambda gw: os.path.join(gw_base_path, f'GW{int(gw)}', 'playermatchstats.csv'),
+        unique_cols=['player_id', 'match_id'], mode=mode, manifest=manifest, label='player match stats',
+        table_name='playermatchstats',
+    )
+    save_manifest(manifest_path, manifest)
 
 # Main execution function
-def main():
+def main(mode=BACKFILL):
     season = "2024-2025"
     season_path = os.path.join('data', season)
 
     # Process all gameweeks for matches and player match stats
-    print("Updating matches by gameweek...")
-    matches_df = update_matches_by_gameweek(season_path)
+    print(f"Updating matches by gameweek ({mode})...")
+    matches_df = update_matches_by_gameweek(season_path, mode)
 
-    print("\nUpdating player match stats by gameweek...")
-    update_player_match_stats(season_path, matches_df)
+    print(f"\nUpdating player match stats by gameweek ({mode})...")
+    update_player_match_stats(season_path, matches_df, mode)
 
     print("\nProcessing complete.")
 
 if __name__ == "__main__":
-    main()
+    # Run from the repository root: python -m scripts.fixcsv [--backfill | --incremental]
+    parser = argparse.ArgumentParser(description="Split the season's master CSVs into gameweek folders.")
+    add_mode_arguments(parser, default=BACKFILL)
+    main(parser.parse_args().mode)
@@ -1,11 +1,113 @@
+import json
+import os
+import pickle
+import shutil
+import weakref
 import polars as pl
 import numpy as np
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.ensemble import BaseEnsemble, RandomForestRegressor, GradientBoostingRegressor
+from sklearn.tree import BaseDecisionTree
 import xgboost as xgb
+from sklearn.base import BaseEstimator, RegressorMixin
 from sklearn.preprocessing import StandardScaler
 
+from scripts.backtest import sort_by_gameweek, walk_forward_backtest
+from scripts.data_curate import feature_column_hashes, feature_definition_hash
+from scripts.optimize import BUDGET, optimize_squad, position_names
+from scripts.tuning import successive_halving
+
+# Bump when the layout of saved predictor bundles changes
+ARTIFACT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+# Quantized copy of each full feature matrix, whose bin edges every fold's training matrix reuses
+_quantile_references = {}
+
+
+class XGBoostBackend(BaseEstimator, RegressorMixin):
+    """
+    Native XGBoost regressor: quantized hist training on all cores, early stopping, NaN as missing
+
+    The bin edges are computed once per full feature matrix; training and
+    validation matrices of row slices of it (the backtest folds) reuse them
+    instead of sketching the data again. Edges only depend on feature values,
+    not on the target. `n_estimators` is the maximum number of rounds when
+    an eval set is given.
+    """
+
+    # Lets the backtest pass each fold's validation rows to fit
+    supports_early_stopping = True
+    # Missing features are routed by the trees, so nulls are kept as NaN
+    handles_missing = True
+
+    def __init__(self, n_estimators=1000, max_depth=6, learning_rate=0.05, subsample=0.8, colsample_bytree=0.8,
+                 early_stopping_rounds=50, max_bin=256, n_jobs=-1, random_state=42):
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.learning_rate = learning_rate
+        self.subsample = subsample
+        self.colsample_bytree = colsample_bytree
+        self.early_stopping_rounds = early_stopping_rounds
+        self.max_bin = max_bin
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X, y, eval_set=None, num_boost_round=None):
+        """
+        Train on X, y; with `eval_set` = (X_val, y_val), stop once its RMSE stops improving
+        """
+        dtrain = xgb.QuantileDMatrix(X, y, ref=self._reference(X), max_bin=self.max_bin, nthread=self.n_jobs)
+        evals, early_stopping_rounds = [], None
+        if eval_set is not None:
+            X_val, y_val = eval_set
+            evals = [(xgb.QuantileDMatrix(X_val, y_val, ref=dtrain, max_bin=self.max_bin, nthread=self.n_jobs), 'val')]
+            early_stopping_rounds = self.early_stopping_rounds
+
+        self.booster_ = xgb.train(
+            self._params(), dtrain, num_boost_round=num_boost_round or self.n_estimators,
+            evals=evals, early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+        )
+        self.best_iteration_ = self.booster_.best_iteration if early_stopping_rounds else None
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict(self, X):
+        rounds = self.booster_.num_boosted_rounds() if self.best_iteration_ is None else self.best_iteration_ + 1
+        return self.booster_.inplace_predict(X, iteration_range=(0, rounds))
+
+    @property
+    def feature_importances_(self):
+        # Total gain per feature, normalised like XGBRegressor's default
+        gain = self.booster_.get_score(importance_type='total_gain')
+        importances = np.zeros(self.n_features_in_, dtype=np.float32)
+        for name, value in gain.items():
+            importances[int(name[1:])] = value
+        total = importances.sum()
+        return importances / total if total > 0 else importances
+
+    def _params(self):
+        return {
+            'objective': 'reg:squarederror', 'tree_method': 'hist', 'max_bin': self.max_bin,
+            'max_depth': self.max_depth, 'eta': self.learning_rate, 'subsample': self.subsample,
+            'colsample_bytree': self.colsample_bytree, 'nthread': self.n_jobs, 'seed': self.random_state,
+        }
+
+    def _reference(self, X):
+        # The full array X is a row slice of (or X itself), as long as columns and layout match
+        root = X
+        while (isinstance(root.base, np.ndarray) and root.base.ndim == 2
+               and root.base.shape[1] == X.shape[1] and root.base.strides == X.strides):
+            root = root.base
+        cached = _quantile_references.get(id(root))
+        if cached is not None and cached[0]() is root and cached[1] == self.max_bin:
+            return cached[2]
+        reference = xgb.QuantileDMatrix(root, max_bin=self.max_bin, nthread=self.n_jobs)
+        key = id(root)
+        _quantile_references[key] = (weakref.ref(root, lambda _: _quantile_references.pop(key, None)),
+                                     self.max_bin, reference)
+        return reference
+
+
 class FPLPointPredictor:
     """
     Complete ML pipeline for FPL point prediction using Polars
@@ -16,14 +118,17 @@ class FPLPointPredictor:
         self.analysis_cols = analysis_cols or ['element', 'gameweek']
         self.target_col = target_col
         self.feature_columns = None
+        # Feature columns of the fitted model, in training order
+        self.trained_feature_columns = None
 
         if use_xgboost:
-            self.model = xgb.XGBRegressor(
-                n_estimators=200,
+            self.model = XGBoostBackend(
+                n_estimators=1000,
                 max_depth=6,
                 learning_rate=0.05,
                 subsample=0.8,
                 colsample_bytree=0.8,
+                early_stopping_rounds=50,
                 random_state=42
             )
         else:
@@ -34,67 +139,92 @@ class FPLPointPredictor:
                 subsample=0.8,
                 random_state=42
             )
+
+        # Tree ensembles split on thresholds, so scaling the features doesn't change them
+        self.scale_features = not isinstance(
+            self.model, (XGBoostBackend, xgb.XGBModel, BaseEnsemble, BaseDecisionTree))
+        # Models that handle missing values get NaN instead of 0 for nulls
+        self.fill_nulls = not getattr(self.model, 'handles_missing', False)
+        self._matrix_cache = {}
     
-    def prepare_features(self, df):
+    def prepare_features(self, df, columns=None):
         """
         Prepare features from Polars DataFrame
+
+        `columns` fixes the feature columns and their order (default: every
+        column except analysis cols and target); a missing one raises ValueError.
+
+        Returns one C-contiguous, read-only float32 array, with nulls as 0
+        (or NaN if the model handles missing values). It is
+        cached per DataFrame object, so training, its CV folds and predictions
+        on the same frame convert it only once.
         """
         # Get feature columns (exclude analysis cols and target)
         exclude_cols = self.analysis_cols + [self.target_col]
-        self.feature_columns = [col for col in df.columns if col not in exclude_cols]
-        
+        if columns is None:
+            self.feature_columns = [col for col in df.columns if col not in exclude_cols]
+        else:
+            missing = [col for col in columns if col not in df.columns]
+            if missing:
+                raise ValueError(f"{len(missing)} feature columns the model was trained on are missing, "
+                                 f"e.g. {missing[:3]}")
+            self.feature_columns = list(columns)
+
+        cached = self._matrix_cache.get(id(df))
+        if cached is not None and cached[0]() is df and cached[1] == self.feature_columns:
+            return cached[2]
+
         # Select features and convert to numpy
-        X = df.select(self.feature_columns).fill_null(0).to_numpy()
+        features = df.select(pl.col(self.feature_columns).cast(pl.Float32))
+        if self.fill_nulls:
+            features = features.fill_null(0)
+        X = features.to_numpy(order='c')
+        X.flags.writeable = False
+        # The entry is dropped together with the frame
+        key = id(df)
+        self._matrix_cache[key] = (
+            weakref.ref(df, lambda _, cache=self._matrix_cache: cache.pop(key, None)), self.feature_columns, X,
+        )
         return X
+
+    def _scale(self, X, fit=False):
+        # Scaling is skipped for tree models; StandardScaler keeps float32
+        if not self.scale_features:
+            return X
+        return self.scaler.fit_transform(X) if fit else self.scaler.transform(X)
     
-    def train(self, df):
+    def train(self, df, n_folds=5, horizon=1, max_workers=None):
         """
         Train the model with proper time series validation
+
+        Validation uses walk-forward folds on gameweek boundaries (see
+        scripts.backtest), fitted in parallel on up to `max_workers` processes;
+        the per-fold results are kept in `self.backtest_results`.
         """
-        # Sort by gameweek to ensure proper time order
-        df = df.sort(['element', 'gameweek'])
+        # Sort by gameweek to ensure proper time order; an already sorted frame is kept, with its cached features
+        df = sort_by_gameweek(df)
         
         # Prepare features and target
         X = self.prepare_features(df)
         y = df[self.target_col].to_numpy()
         
         # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Time series split for validation
-        tscv = TimeSeriesSplit(n_splits=5)
+        X_scaled = self._scale(X, fit=True)
         
-        # Store validation results
-        val_scores = []
-        feature_importance = []
-        
-        # Get gameweeks for proper splitting
-        gameweeks = df['gameweek'].to_numpy()
-        
-        # Cross-validation with time-aware splitting
-        for fold, (train_idx, val_idx) in enumerate(tscv.split(X_scaled)):
-            # Ensure we're not using future gameweeks to predict past
-            train_gw_max = gameweeks[train_idx].max()
-            val_gw_min = gameweeks[val_idx].min()
-            
-            print(f"Fold {fold+1}: Training up to GW {train_gw_max}, validating on GW {val_gw_min}+")
-            
-            X_train, X_val = X_scaled[train_idx], X_scaled[val_idx]
-            y_train, y_val = y[train_idx], y[val_idx]
-            
-            self.model.fit(X_train, y_train)
-            val_pred = self.model.predict(X_val)
-            
-            mae = mean_absolute_error(y_val, val_pred)
-            r2 = r2_score(y_val, val_pred)
-            val_scores.append({'mae': mae, 'r2': r2})
-            
-            # Feature importance
-            if hasattr(self.model, 'feature_importances_'):
-                feature_importance.append(self.model.feature_importances_)
+        # Cross-validation on gameweek boundaries, each fold in its own process
+        self.backtest_results = walk_forward_backtest(self, df, n_folds=n_folds, horizon=horizon,
+                                                      max_workers=max_workers)
+        val_scores = self.backtest_results.select(['mae', 'r2']).to_dicts()
+        feature_importance = [imp for imp in self.backtest_results['feature_importances'].to_list() if imp is not None]
         
-        # Train final model on all data
-        self.model.fit(X_scaled, y)
+        # Train final model on all data, for the median number of rounds early stopping chose per fold
+        fit_params = {}
+        if 'best_iteration' in self.backtest_results.columns:
+            best_iterations = self.backtest_results['best_iteration'].drop_nulls()
+            if len(best_iterations):
+                fit_params['num_boost_round'] = int(best_iterations.median()) + 1
+        self.model.fit(X_scaled, y, **fit_params)
+        self.trained_feature_columns = list(self.feature_columns)
         
         # Average feature importance
         if feature_importance:
@@ -117,6 +247,22 @@ class FPLPointPredictor:
         
         return val_scores
     
+    def tune(self, df, n_candidates=27, resource='n_estimators', n_folds=2, horizon=1, max_workers=None,
+             log_path=None, **kwargs):
+        """
+        Search the model's parameters with successive halving (see scripts.tuning) and keep the best
+
+        With `log_path`, an interrupted search resumes from its trial log. With
+        the 'n_estimators' resource the model also takes the tree count of the
+        last rung, the one the best parameters were scored at. The trials are
+        kept in `self.tuning_results`; call train next.
+        """
+        self.tuning_results, best_params = successive_halving(
+            self, df, n_candidates=n_candidates, resource=resource, n_folds=n_folds, horizon=horizon,
+            max_workers=max_workers, log_path=log_path, **kwargs)
+        self.model.set_params(**best_params)
+        return best_params
+
     def predict_next_gameweek(self, df_current_gw):
         """
         Predict points for the next gameweek
@@ -124,9 +270,9 @@ class FPLPointPredictor:
         # Store actual points if available
         has_actual = self.target_col in df_current_gw.columns
         
-        # Prepare features
-        X_current = self.prepare_features(df_current_gw)
-        X_scaled = self.scaler.transform(X_current)
+        # Prepare features, in the order the model was trained on
+        X_current = self.prepare_features(df_current_gw, columns=self.trained_feature_columns)
+        X_scaled = self._scale(X_current)
         
         # Make predictions
         predictions = self.model.predict(X_scaled)
@@ -149,26 +295,126 @@ class FPLPointPredictor:
         """
         Get top player recommendations by position
         """
-        # Check if position is numeric
-        if predictions_df['position'].dtype in [pl.Int32, pl.Int64, pl.Float32, pl.Float64]:
-            # First cast to string, then replace
-            position_map = {'1': 'GKP', '2': 'DEF', '3': 'MID', '4': 'FWD'}
-            predictions_df = predictions_df.with_columns(
-                pl.col('position').cast(pl.Utf8).replace(position_map).alias('position_name')
-            )
-            pos_col = 'position_name'
-        else:
-            pos_col = 'position'
-        
-        # Get top picks by position
+        # One sort and one grouped head instead of a filter and sort per position
+        top = (
+            predictions_df.with_columns(position_names(predictions_df['position']))
+            .sort(sort_by, descending=True)
+            .group_by('position_name', maintain_order=True)
+            .head(n_per_position)
+        )
+        by_position = top.partition_by('position_name', as_dict=True)
+
         top_picks = {}
-        
         for pos in ['GKP', 'DEF', 'MID', 'FWD']:
-            pos_players = predictions_df.filter(pl.col(pos_col) == pos).sort(sort_by, descending=True)
-            
-            if not pos_players.is_empty():
-                top_picks[pos] = pos_players.head(n_per_position).select([
+            if (pos,) in by_position:
+                top_picks[pos] = by_position[(pos,)].select([
                     'name', 'team', 'value', 'predicted_points', 'predicted_value', 'total_points',
                 ])
         
-        return top_picks
\ No newline at end of file
+        return top_picks
+
+    def optimize_squad(self, predictions_df, budget=BUDGET, **kwargs):
+        """
+        Best squad, starting XI and captain for predicted points under the FPL rules (see scripts.optimize)
+        """
+        return optimize_squad(predictions_df, budget=budget, **kwargs)
+
+    def save(self, path):
+        """
+        Save the fitted predictor as a bundle directory at `path`
+
+        The bundle holds manifest.json (version, settings, feature columns and
+        their definition hashes), the model in XGBoost's native format
+        (model.ubj) or pickled for other models (model.pkl), and the scaler
+        parameters as arrays (scaler.npz) when features are scaled.
+        """
+        if self.trained_feature_columns is None:
+            raise ValueError("Only a trained predictor can be saved; call train first")
+
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        if isinstance(self.model, XGBoostBackend):
+            model_kind, model_file = 'xgboost-backend', 'model.ubj'
+            self.model.booster_.save_model(os.path.join(tmp_path, model_file))
+        elif isinstance(self.model, xgb.XGBModel):
+            model_kind, model_file = 'xgboost-sklearn', 'model.ubj'
+            self.model.save_model(os.path.join(tmp_path, model_file))
+        else:
+            model_kind, model_file = 'pickle', 'model.pkl'
+            with open(os.path.join(tmp_path, model_file), 'wb') as f:
+                pickle.dump(self.model, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if self.scale_features:
+            np.savez(os.path.join(tmp_path, 'scaler.npz'), mean=self.scaler.mean_, scale=self.scaler.scale_,
+                     var=self.scaler.var_, n_samples_seen=self.scaler.n_samples_seen_)
+
+        manifest = {
+            'artifact_version': ARTIFACT_VERSION,
+            'model_kind': model_kind,
+            'model_file': model_file,
+            'model_params': self.model.get_params() if model_kind == 'xgboost-backend' else None,
+            'analysis_cols': self.analysis_cols,
+            'target_col': self.target_col,
+            'scale_features': self.scale_features,
+            'fill_nulls': self.fill_nulls,
+            'feature_definition': feature_definition_hash(),
+            'feature_columns': feature_column_hashes(self.trained_feature_columns),
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.write('\n')
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, check_features=True):
+        """
+        Load a predictor saved with save(), ready to predict
+
+        Raises ValueError if the bundle has another version, or (with
+        `check_features`) if any of its feature columns is now defined
+        differently by scripts.data_curate.
+        """
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if manifest.get('artifact_version') != ARTIFACT_VERSION:
+            raise ValueError(f"Predictor bundle at {path} has version {manifest.get('artifact_version')}, "
+                             f"expected {ARTIFACT_VERSION}; retrain and save it again")
+
+        columns = list(manifest['feature_columns'])
+        if check_features:
+            current = feature_column_hashes(columns)
+            stale = [col for col in columns if manifest['feature_columns'][col] != current[col]]
+            if stale:
+                raise ValueError(f"{len(stale)} feature columns of the predictor at {path} are defined differently "
+                                 f"now (e.g. {stale[:3]}); retrain it")
+
+        predictor = cls(analysis_cols=manifest['analysis_cols'], target_col=manifest['target_col'])
+        model_path = os.path.join(path, manifest['model_file'])
+        if manifest['model_kind'] == 'xgboost-backend':
+            predictor.model = XGBoostBackend(**manifest['model_params'])
+            predictor.model.booster_ = xgb.Booster(model_file=model_path)
+            predictor.model.best_iteration_ = None
+            predictor.model.n_features_in_ = len(columns)
+        elif manifest['model_kind'] == 'xgboost-sklearn':
+            predictor.model = xgb.XGBRegressor()
+            predictor.model.load_model(model_path)
+        else:
+            with open(model_path, 'rb') as f:
+                predictor.model = pickle.load(f)
+
+        predictor.scale_features = manifest['scale_features']
+        predictor.fill_nulls = manifest['fill_nulls']
+        if predictor.scale_features:
+            with np.load(os.path.join(path, 'scaler.npz')) as scaler:
+                predictor.scaler.mean_ = scaler['mean']
+                predictor.scaler.scale_ = scaler['scale']
+                predictor.scaler.var_ = scaler['var']
+                predictor.scaler.n_samples_seen_ = scaler['n_samples_seen']
+                predictor.scaler.n_features_in_ = len(columns)
+        predictor.feature_columns = columns
+        predictor.trained_feature_columns = columns
+        return predictor
@@ -0,0 +1,146 @@
+import numpy as np
+import polars as pl
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import csr_matrix, eye, hstack, vstack
+
+# FPL squad rules; money is in tenths of £m, like the `value` column
+SQUAD_QUOTAS = {'GKP': 2, 'DEF': 5, 'MID': 5, 'FWD': 3}
+STARTING_LIMITS = {'GKP': (1, 1), 'DEF': (3, 5), 'MID': (2, 5), 'FWD': (1, 3)}
+STARTERS = 11
+MAX_PER_TEAM = 3
+BUDGET = 1000
+
+# Weight of bench points in the objective; they only count if a starter doesn't play
+BENCH_WEIGHT = 0.1
+
+# Position codes (see data_curate.POSITION_CODES) and names in the data, mapped to squad positions
+POSITION_NAMES = {
+    '1': 'GKP', '2': 'DEF', '3': 'MID', '4': 'FWD',
+    'GK': 'GKP', 'GKP': 'GKP', 'DEF': 'DEF', 'MID': 'MID', 'FWD': 'FWD',
+    'Goalkeeper': 'GKP', 'Defender': 'DEF', 'Midfielder': 'MID', 'Forward': 'FWD',
+}
+
+
+def position_names(position):
+    """Squad position (GKP/DEF/MID/FWD) of a position column, null for anything else (e.g. AM)."""
+    if position.dtype.is_numeric():
+        position = position.cast(pl.Int64)
+    return position.cast(pl.Utf8).replace_strict(POSITION_NAMES, default=None).alias('position_name')
+
+
+def optimize_squad(predictions_df, budget=BUDGET, points_col='predicted_points', bench_weight=BENCH_WEIGHT,
+                   prefilter=True):
+    """
+    Best 15-man squad, starting XI and captain for `predictions_df` under the FPL rules
+
+    Needs `points_col`, 'value', 'position' and 'team' columns, one row per
+    player. Maximises the starters' points plus the captain's points again,
+    plus `bench_weight` times the bench's points, within `budget`, the 2/5/5/3
+    position quotas, a valid formation and at most 3 players per team. The
+    integer program is solved exactly (HiGHS branch and bound); `prefilter`
+    first drops players that provably can't be needed (see
+    dominated_players). Returns a dict with the squad frame (with 'starter'
+    and 'captain' columns), expected points and cost.
+    """
+    df = predictions_df.with_columns(position_names(predictions_df['position']))
+    df = df.filter(pl.col('position_name').is_not_null() & pl.col(points_col).is_not_null()
+                   & pl.col('value').is_not_null())
+
+    points = df[points_col].to_numpy().astype(np.float64)
+    cost = df['value'].to_numpy().astype(np.float64)
+    positions = df['position_name'].to_numpy()
+    teams = df['team'].to_numpy()
+    candidates = ~dominated_players(points, cost, positions, teams) if prefilter else np.ones(len(df), dtype=bool)
+    df, points, cost = df.filter(pl.Series(candidates)), points[candidates], cost[candidates]
+    positions, teams = positions[candidates], teams[candidates]
+
+    squad, starter, captain = _solve_squad(points, cost, positions, teams, budget, bench_weight)
+    picked = df.with_columns(pl.Series('starter', starter), pl.Series('captain', captain)).filter(pl.Series(squad))
+    position_order = pl.col('position_name').replace_strict({pos: i for i, pos in enumerate(SQUAD_QUOTAS)})
+    picked = picked.sort([pl.col('starter'), position_order, pl.col(points_col)], descending=[True, False, True])
+    starting = points[starter]
+    return {
+        'squad': picked,
+        'starting_xi': picked.filter(pl.col('starter')),
+        'captain': picked.filter(pl.col('captain')),
+        'expected_points': float(starting.sum() + points[captain].sum()),
+        'bench_points': float(points[squad & ~starter].sum()),
+        'cost': float(cost[squad].sum()),
+        'candidates': int(candidates.sum()),
+    }
+
+
+def dominated_players(points, cost, positions, teams, quotas=SQUAD_QUOTAS, max_per_team=MAX_PER_TEAM):
+    """
+    Players no optimal squad needs, found with one vectorized pass per position
+
+    Player j dominates i (same position) if j scores at least as much for
+    at most the same price, ties broken by index. Swapping i for an unused
+    dominator keeps the squad valid and its points at least as high, as
+    long as the dominator's team isn't full. Besides i, a squad holds at
+    most quota - 1 other players of i's position, and 14 players can fill
+    at most 14 // 3 = 4 other teams. So if i has more dominators than
+    quota - 1 plus those in the 4 other teams that hold most of them, some
+    dominator can always take its place, and i can be dropped.
+    """
+    dominated = np.zeros(len(points), dtype=bool)
+    blockable_teams = (sum(quotas.values()) - 1) // max_per_team
+    team_codes = np.unique(teams, return_inverse=True)[1]
+    for position, quota in quotas.items():
+        idx = np.flatnonzero(positions == position)
+        if len(idx) == 0:
+            continue
+        p, c, order = points[idx], cost[idx], np.arange(len(idx))
+        better = (p[None, :] > p[:, None]) | ((p[None, :] == p[:, None]) & (order[None, :] < order[:, None]))
+        cheaper = (c[None, :] < c[:, None]) | ((c[None, :] == c[:, None]) & (order[None, :] < order[:, None]))
+        # dominators[i, j]: j dominates i, and is strictly ahead of it in a fixed order, so chains of swaps end
+        dominators = (p[None, :] >= p[:, None]) & (c[None, :] <= c[:, None]) & (better | cheaper)
+        one_hot = np.eye(team_codes.max() + 1, dtype=np.int64)[team_codes[idx]]
+        per_team = dominators.astype(np.int64) @ one_hot
+        per_team[np.arange(len(idx)), team_codes[idx]] = 0
+        blocked = np.sort(per_team, axis=1)[:, ::-1][:, :blockable_teams].sum(axis=1)
+        dominated[idx] = dominators.sum(axis=1) - (quota - 1) - blocked >= 1
+    return dominated
+
+
+def _solve_squad(points, cost, positions, teams, budget, bench_weight):
+    """
+    Integer program over squad (x), starter (s) and captain (k) indicators of every player
+    """
+    n = len(points)
+    if n == 0:
+        raise ValueError("No players to pick a squad from")
+    zero, ident = csr_matrix((1, n)), eye(n, format='csr')
+
+    rows, lower, upper = [], [], []
+
+    def add(x=None, s=None, k=None, lb=-np.inf, ub=np.inf):
+        row = [csr_matrix(np.asarray(v, dtype=np.float64).reshape(1, n)) if v is not None else zero for v in (x, s, k)]
+        rows.append(hstack(row))
+        lower.append(lb)
+        upper.append(ub)
+
+    for position, quota in SQUAD_QUOTAS.items():
+        in_position = (positions == position).astype(np.float64)
+        add(x=in_position, lb=quota, ub=quota)
+        low, high = STARTING_LIMITS[position]
+        add(s=in_position, lb=low, ub=high)
+    for team in np.unique(teams):
+        add(x=(teams == team).astype(np.float64), ub=MAX_PER_TEAM)
+    add(x=cost, ub=budget)
+    add(s=np.ones(n), lb=STARTERS, ub=STARTERS)
+    add(k=np.ones(n), lb=1, ub=1)
+
+    # Starters come from the squad and the captain from the starters
+    links = vstack([hstack([-ident, ident, csr_matrix((n, n))]), hstack([csr_matrix((n, n)), -ident, ident])])
+    constraints = [
+        LinearConstraint(vstack(rows).tocsr(), lower, upper),
+        LinearConstraint(links.tocsr(), -np.inf, 0),
+    ]
+    objective = -np.concatenate([bench_weight * points, (1 - bench_weight) * points, points])
+    result = milp(objective, constraints=constraints, integrality=np.ones(3 * n), bounds=Bounds(0, 1))
+    if not result.success:
+        raise ValueError(f"No valid squad within a budget of {budget}: {result.message}")
+
+    chosen = np.round(result.x).astype(bool)
+    return chosen[:n], chosen[n:2 * n], chosen[2 * n:]
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from scripts.schema import read_table_csv
+
+# Partition write modes shared by fixcsv.py and split_csv_data.py
+BACKFILL = 'backfill'
+INCREMENTAL = 'incremental'
+
+
+def create_directory(path):
+    Path(path).mkdir(parents=True, exist_ok=True)
+
+
+def iter_partitions(df, key):
+    """
+    Yield (key_value, rows) for every distinct value of `key`.
+
+    The frame is sorted once and each partition is a contiguous positional
+    slice of the sorted frame, so nothing is re-scanned per partition. Rows
+    with a missing key are skipped.
+    """
+    df = df[df[key].notna()]
+    order = np.argsort(df[key].to_numpy(), kind='stable')
+    sorted_df = df.iloc[order]
+    keys = sorted_df[key].to_numpy()
+    if len(keys) == 0:
+        return
+    boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(keys)]))
+    for start, end in zip(starts, ends):
+        yield keys[start], sorted_df.iloc[start:end]
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    create_directory(os.path.dirname(path))
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def write_partitions(df, key, path_for, unique_cols, mode, manifest, label='rows', table_name=None):
+    """
+    Write every partition of `df` by `key` in a single pass.
+
+    `path_for(key_value)` gives the CSV path of a partition. In BACKFILL mode
+    every partition is rewritten from `df` alone. In INCREMENTAL mode only
+    partitions whose source rows changed since the last run (according to the
+    content hashes in `manifest`) are touched, and they are merged into the
+    existing file on `unique_cols`, which is read with the registry types of
+    `table_name` when given. Returns the key values that were written.
+    """
+    written = []
+    for key_value, rows in iter_partitions(df, key):
+        file_path = path_for(key_value)
+        content = rows.to_csv(index=False)
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        manifest_key = Path(file_path).as_posix()
+        if mode == INCREMENTAL and manifest.get(manifest_key) == digest and os.path.exists(file_path):
+            continue
+
+        create_directory(os.path.dirname(file_path))
+        if mode == INCREMENTAL and os.path.exists(file_path):
+            existing = read_table_csv(file_path, table_name, compact=False) if table_name else pd.read_csv(file_path)
+            merged = pd.concat([existing, rows]).drop_duplicates(subset=unique_cols, keep='last')
+            merged.to_csv(file_path, index=False)
+            n_rows = len(merged)
+        else:
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+            n_rows = len(rows)
+        manifest[manifest_key] = digest
+        written.append(key_value)
+        print(f"Updated {os.path.relpath(os.path.dirname(file_path))} with {n_rows} {label}")
+    return written
+
+
+def add_mode_arguments(parser, default):
+    """Add the mutually exclusive --backfill / --incremental flags to an argparse parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--backfill', dest='mode', action='store_const', const=BACKFILL,
+                       help="Rebuild every partition of the season from the master CSVs.")
+    group.add_argument('--incremental', dest='mode', action='store_const', const=INCREMENTAL,
+                       help="Only touch partitions whose rows changed since the last run.")
+    parser.set_defaults(mode=default)
@@ -0,0 +1,293 @@
+import os
+import time
+import numpy as np
+import polars as pl
+
+from scripts.optimize import BENCH_WEIGHT, BUDGET, MAX_PER_TEAM, SQUAD_QUOTAS, STARTERS, STARTING_LIMITS, \
+    optimize_squad, position_names
+from scripts.schema import read_table_csv
+
+# Beam search settings: states kept per gameweek, and single/double transfers tried per state
+BEAM_WIDTH = 32
+SWAPS_PER_STATE = 24
+# FPL transfer rules: one free transfer per gameweek, banked up to MAX_FREE_TRANSFERS, HIT_COST points per extra one
+HIT_COST = 4
+MAX_FREE_TRANSFERS = 5
+# Lineup scores kept in the memo; a 5-gameweek plan needs well under this
+MEMO_SIZE = 500_000
+
+
+def fixture_counts(season_path, gameweeks):
+    """
+    Number of unplayed fixtures per team in each of `gameweeks`, from 'By Gameweek/GWn/fixtures.csv'
+
+    Returns team_code, team (name from the season's teams.csv), gameweek and
+    fixtures; a team without a row has a blank gameweek. Gameweeks without a
+    fixtures file are left out.
+    """
+    frames = []
+    for gw in gameweeks:
+        path = os.path.join(season_path, 'By Gameweek', f'GW{gw}', 'fixtures.csv')
+        if not os.path.exists(path):
+            print(f"No fixtures for GW{gw} at {path}")
+            continue
+        fixtures = pl.from_pandas(read_table_csv(path, 'matches', compact=False)[['home_team', 'away_team', 'finished']])
+        fixtures = fixtures.filter(~pl.col('finished').fill_null(False))
+        frames.append(
+            pl.concat([fixtures.select(pl.col('home_team').alias('team_code')),
+                       fixtures.select(pl.col('away_team').alias('team_code'))])
+            .group_by('team_code').len(name='fixtures')
+            .with_columns(pl.lit(gw, dtype=pl.Int64).alias('gameweek'))
+        )
+    counts = pl.concat(frames) if frames else pl.DataFrame(
+        schema={'team_code': pl.Int64, 'fixtures': pl.UInt32, 'gameweek': pl.Int64})
+    counts = counts.with_columns(pl.col('team_code').cast(pl.Int64), pl.col('fixtures').cast(pl.Int64))
+
+    teams_path = os.path.join(season_path, 'teams.csv')
+    if os.path.exists(teams_path):
+        teams = pl.from_pandas(read_table_csv(teams_path, 'teams', compact=False)[['code', 'name']])
+        counts = counts.join(teams.select(pl.col('code').cast(pl.Int64).alias('team_code'), pl.col('name').alias('team')),
+                             on='team_code', how='left')
+    return counts.select([col for col in ['team_code', 'team', 'gameweek', 'fixtures'] if col in counts.columns])
+
+
+def plan_transfers(players, gameweeks, squad=None, bank=0, free_transfers=1, fixtures=None, team_col='team',
+                   points_col='predicted_points', max_transfers=2, beam_width=BEAM_WIDTH,
+                   swaps_per_state=SWAPS_PER_STATE, hit_cost=HIT_COST, bench_weight=BENCH_WEIGHT):
+    """
+    Plan transfers over `gameweeks` with a beam search over squad states
+
+    `players` has one row per player, like the output of
+    FPLPointPredictor.predict_next_gameweek (element, position, `team_col`, value
+    and `points_col`, the predicted points per fixture) or, for per-gameweek
+    predictions, one row per player and gameweek with a 'gameweek' column.
+    With `fixtures` (see fixture_counts, joined on `team_col`), points are
+    scaled by each team's number of fixtures, so blank and double gameweeks
+    count. `squad` lists the 15 current elements; without it the plan
+    starts from the optimal squad for the first gameweek within BUDGET.
+
+    Each gameweek, every kept state may roll its transfer or make up to
+    `max_transfers` (1 or 2) transfers, ranked from a vectorized score of all
+    swaps; extra transfers cost `hit_cost` points and unused ones are banked.
+    States are ranked by points so far plus what their squad would score for
+    the rest of the horizon; lineup scores are memoized per squad. Players
+    are bought and sold at `value`.
+    """
+    start = time.perf_counter()
+    gameweeks = list(gameweeks)
+    tables, frame = _planner_tables(players, gameweeks, fixtures, team_col, points_col, bench_weight)
+
+    if squad is None:
+        first = frame.with_columns(pl.Series(points_col, tables['points'][:, 0]))
+        picked = optimize_squad(first, budget=BUDGET, points_col=points_col, bench_weight=bench_weight)
+        squad = picked['squad']['element'].to_list()
+        bank = BUDGET - picked['cost']
+    squad = _squad_indices(frame, squad, tables)
+
+    beam = [{'squad': squad, 'bank': float(bank), 'free_transfers': int(free_transfers), 'points': 0.0, 'moves': []}]
+    for t, gw in enumerate(gameweeks):
+        children = [child for state in beam
+                    for child in _expand_state(tables, state, t, max_transfers, swaps_per_state, hit_cost)]
+        beam = _select_beam(children, beam_width)
+
+    best = max(beam, key=lambda state: state['points'])
+    print(f"Planned {len(gameweeks)} gameweeks in {time.perf_counter() - start:.2f}s: "
+          f"{best['points']:.1f} expected points")
+    return _plan_summary(best, frame, gameweeks)
+
+
+def _planner_tables(players, gameweeks, fixtures, team_col, points_col, bench_weight):
+    """
+    Per-player arrays used by the search: points (players x gameweeks), cost, position and team codes
+    """
+    if 'gameweek' in players.columns:
+        wide = players.filter(pl.col('gameweek').is_in(gameweeks)).pivot(
+            on='gameweek', index='element', values=points_col, aggregate_function='sum')
+        frame = (players.sort('gameweek').unique('element', keep='last', maintain_order=True)
+                 .drop([points_col, 'gameweek']).join(wide, on='element', how='inner'))
+        points = np.column_stack([
+            frame[str(gw)].fill_null(0).to_numpy().astype(np.float64) if str(gw) in frame.columns
+            else np.zeros(len(frame)) for gw in gameweeks
+        ])
+    else:
+        frame = players
+        points = np.repeat(frame[points_col].fill_null(0).to_numpy().astype(np.float64)[:, None], len(gameweeks), 1)
+
+    frame = frame.with_columns(position_names(frame['position']))
+    keep = (frame['position_name'].is_not_null() & frame['value'].is_not_null()).to_numpy()
+    frame, points = frame.filter(pl.Series(keep)), points[keep]
+    if fixtures is not None:
+        counts = np.ones_like(points)
+        for t, gw in enumerate(gameweeks):
+            gw_counts = fixtures.filter(pl.col('gameweek') == gw)
+            if len(gw_counts):
+                counts[:, t] = frame.select(team_col).join(gw_counts.select(team_col, 'fixtures'), on=team_col,
+                                                           how='left', maintain_order='left')['fixtures'] \
+                    .fill_null(0).to_numpy()
+        points = points * counts
+
+    position_codes = {pos: i for i, pos in enumerate(SQUAD_QUOTAS)}
+    tables = {
+        'points': points,
+        'cost': frame['value'].to_numpy().astype(np.float64),
+        'position': frame['position_name'].replace_strict(position_codes).to_numpy().astype(np.int64),
+        'team': np.unique(frame[team_col].to_numpy().astype(str), return_inverse=True)[1],
+        'bench_weight': bench_weight,
+    }
+    return tables, frame
+
+
+def _squad_indices(frame, squad, tables):
+    row_of = {element: i for i, element in enumerate(frame['element'].to_list())}
+    missing = [element for element in squad if element not in row_of]
+    if missing:
+        raise ValueError(f"Squad players without predictions: {missing}")
+    indices = tuple(sorted(row_of[element] for element in squad))
+    per_position = np.bincount(tables['position'][list(indices)], minlength=len(SQUAD_QUOTAS))
+    if per_position.tolist() != list(SQUAD_QUOTAS.values()):
+        raise ValueError(f"Squad must have {SQUAD_QUOTAS} players, got {per_position.tolist()}")
+    return indices
+
+
+def _squad_scores(tables, squad):
+    """
+    Best lineup score of `squad` in every gameweek: starters, the captain again and weighted bench points
+
+    Memoized per squad; the starters are the position minimums plus the
+    best of the rest up to STARTERS, for all gameweeks at once.
+    """
+    memo = tables.setdefault('memo', {})
+    scores = memo.get(squad)
+    if scores is not None:
+        return scores
+
+    points = tables['points'][list(squad)]
+    position = tables['position'][list(squad)]
+    required, optional, best = [], [], []
+    for code, (low, high) in enumerate(STARTING_LIMITS.values()):
+        ranked = -np.sort(-points[position == code], axis=0)
+        required.append(ranked[:low])
+        optional.append(ranked[low:high])
+        best.append(ranked[0])
+    optional = -np.sort(-np.concatenate(optional), axis=0)
+    starters = np.concatenate(required).sum(axis=0) + optional[:STARTERS - sum(len(r) for r in required)].sum(axis=0)
+    # The best player of each position always starts, so the captain is the best of those
+    captain = np.max(best, axis=0)
+    scores = starters + captain + tables['bench_weight'] * (points.sum(axis=0) - starters)
+
+    if len(memo) >= MEMO_SIZE:
+        memo.clear()
+    memo[squad] = scores
+    return scores
+
+
+def _candidate_swaps(tables, squad, bank, t, max_swaps):
+    """
+    Best single transfers for `squad`, scored for all players at once by points over the rest of the horizon
+
+    Returns (out, in, gain) arrays of valid swaps with a positive gain, best first.
+    """
+    points, cost, position, team = tables['points'], tables['cost'], tables['position'], tables['team']
+    squad = np.array(squad)
+    remaining = points[:, t:].sum(axis=1)
+    in_squad = np.zeros(len(points), dtype=bool)
+    in_squad[squad] = True
+    team_counts = np.bincount(team[squad], minlength=team.max() + 1)
+
+    gain = remaining[None, :] - remaining[squad][:, None]
+    valid = ((position[None, :] == position[squad][:, None]) & ~in_squad[None, :]
+             & (cost[None, :] <= bank + cost[squad][:, None] + 1e-9)
+             & ((team_counts[team][None, :] < MAX_PER_TEAM) | (team[None, :] == team[squad][:, None]))
+             & (gain > 0))
+    out_pos, in_idx = np.nonzero(valid)
+    gains = gain[out_pos, in_idx]
+    order = np.argsort(-gains, kind='stable')[:max_swaps]
+    return squad[out_pos[order]], in_idx[order], gains[order]
+
+
+def _double_swaps(tables, squad, bank, outs, ins, gains, max_swaps):
+    # Pairs of single swaps that are still valid together: distinct players, budget and team limits
+    if len(outs) < 2:
+        return []
+    cost, team = tables['cost'], tables['team']
+    team_counts = np.bincount(team[list(squad)], minlength=team.max() + 1)
+    a, b = np.triu_indices(len(outs), k=1)
+    after_a = (team_counts[team[ins[a]]] - (team[outs[a]] == team[ins[a]]) - (team[outs[b]] == team[ins[a]])
+               + 1 + (team[ins[b]] == team[ins[a]]))
+    after_b = (team_counts[team[ins[b]]] - (team[outs[a]] == team[ins[b]]) - (team[outs[b]] == team[ins[b]])
+               + 1 + (team[ins[a]] == team[ins[b]]))
+    valid = ((outs[a] != outs[b]) & (ins[a] != ins[b])
+             & (cost[ins[a]] + cost[ins[b]] <= bank + cost[outs[a]] + cost[outs[b]] + 1e-9)
+             & (after_a <= MAX_PER_TEAM) & (after_b <= MAX_PER_TEAM))
+    a, b = a[valid], b[valid]
+    order = np.argsort(-(gains[a] + gains[b]), kind='stable')[:max_swaps]
+    return [((outs[a[i]], outs[b[i]]), (ins[a[i]], ins[b[i]])) for i in order]
+
+
+def _expand_state(tables, state, t, max_transfers, swaps_per_state, hit_cost):
+    """
+    Child states of `state` after gameweek t: roll the transfer, or make one or two of the best swaps
+    """
+    squad, bank, free = state['squad'], state['bank'], state['free_transfers']
+    moves = [((), ())]
+    if max_transfers >= 1:
+        outs, ins, gains = _candidate_swaps(tables, squad, bank, t, swaps_per_state)
+        moves += [((o,), (i,)) for o, i in zip(outs, ins)]
+        if max_transfers >= 2:
+            moves += _double_swaps(tables, squad, bank, outs, ins, gains, swaps_per_state)
+
+    children = []
+    for out, in_ in moves:
+        new_squad = tuple(sorted(set(squad).difference(out).union(in_))) if out else squad
+        hits = max(0, len(out) - free)
+        scores = _squad_scores(tables, new_squad)
+        points = state['points'] + scores[t] - hit_cost * hits
+        children.append({
+            'squad': new_squad,
+            'bank': bank + float(tables['cost'][list(out)].sum() - tables['cost'][list(in_)].sum()),
+            'free_transfers': min(max(free - len(out), 0) + 1, MAX_FREE_TRANSFERS),
+            'points': points,
+            # Ranking: points so far plus what this squad scores for the rest of the horizon
+            'bound': points + scores[t + 1:].sum(),
+            'moves': state['moves'] + [(tuple(int(o) for o in out), tuple(int(i) for i in in_), hits)],
+        })
+    return children
+
+
+def _select_beam(children, beam_width):
+    # Best `beam_width` distinct states; of equal squads and free transfers the best one is kept
+    best = {}
+    for child in children:
+        key = (child['squad'], child['free_transfers'])
+        kept = best.get(key)
+        if kept is None or (child['bound'], child['bank']) > (kept['bound'], kept['bank']):
+            best[key] = child
+    return sorted(best.values(), key=lambda state: (state['bound'], state['bank']), reverse=True)[:beam_width]
+
+
+def _plan_summary(best, frame, gameweeks):
+    """
+    The chosen plan as one row per gameweek, plus the final squad
+    """
+    names = frame['name'].to_list() if 'name' in frame.columns else frame['element'].to_list()
+    elements = frame['element'].to_list()
+    rows = []
+    for gw, (out, in_, hits) in zip(gameweeks, best['moves']):
+        rows.append({
+            'gameweek': gw,
+            'transfers_out': [names[i] for i in out],
+            'transfers_in': [names[i] for i in in_],
+            'elements_out': [elements[i] for i in out],
+            'elements_in': [elements[i] for i in in_],
+            'hits': hits,
+        })
+    squad = [elements[i] for i in best['squad']]
+    return {
+        'plan': pl.DataFrame(rows, schema={'gameweek': pl.Int64, 'transfers_out': pl.List(pl.Utf8),
+                                           'transfers_in': pl.List(pl.Utf8), 'elements_out': pl.List(pl.Int64),
+                                           'elements_in': pl.List(pl.Int64), 'hits': pl.Int64}),
+        'expected_points': best['points'],
+        'bank': best['bank'],
+        'free_transfers': best['free_transfers'],
+        'squad': squad,
+    }
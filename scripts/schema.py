@@ -0,0 +1,275 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+# Logical column types used by the registry. Integers and booleans are stored
+# in their narrow form everywhere (nullable only when a column has gaps);
+# 'float32' and 'category' are only applied in compact (in-memory) mode, so
+# CSV and Parquet writers keep full float precision and plain text values.
+INT8, INT16, INT32 = 'int8', 'int16', 'int32'
+FLOAT32 = 'float32'
+BOOL = 'bool'
+CATEGORY = 'category'
+STR = 'str'
+
+_INT_DTYPES = {INT8: 'Int8', INT16: 'Int16', INT32: 'Int32'}
+_PANDAS_TYPES = {
+    pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(), pa.bool_(): pd.BooleanDtype(),
+}
+_ARROW_TYPES = {INT8: pa.int8(), INT16: pa.int16(), INT32: pa.int32(), BOOL: pa.bool_(), STR: pa.string()}
+
+
+def _side_stats(stats):
+    """Expand per-team match stats into their home_ / away_ columns."""
+    return {f"{side}_{name}": kind for name, kind in stats.items() for side in ('home', 'away')}
+
+
+_MATCH_TEAM_STATS = {
+    'possession': INT16, 'expected_goals_xg': FLOAT32, 'total_shots': INT16, 'shots_on_target': INT16,
+    'big_chances': INT16, 'big_chances_missed': INT16, 'accurate_passes': INT16, 'accurate_passes_pct': INT16,
+    'fouls_committed': INT16, 'corners': INT16, 'xg_open_play': FLOAT32, 'xg_set_play': FLOAT32,
+    'non_penalty_xg': FLOAT32, 'xg_on_target_xgot': FLOAT32, 'shots_off_target': INT16, 'blocked_shots': INT16,
+    'hit_woodwork': INT16, 'shots_inside_box': INT16, 'shots_outside_box': INT16, 'passes': INT16,
+    'own_half': INT16, 'opposition_half': INT16, 'accurate_long_balls': INT16, 'accurate_long_balls_pct': INT16,
+    'accurate_crosses': INT16, 'accurate_crosses_pct': INT16, 'throws': INT16,
+    'touches_in_opposition_box': INT16, 'offsides': INT16, 'yellow_cards': INT16, 'red_cards': INT16,
+    'tackles_won': INT16, 'tackles_won_pct': INT16, 'interceptions': INT16, 'blocks': INT16,
+    'clearances': INT16, 'keeper_saves': INT16, 'duels_won': INT16, 'ground_duels_won': INT16,
+    'ground_duels_won_pct': INT16, 'aerial_duels_won': INT16, 'aerial_duels_won_pct': INT16,
+    'successful_dribbles': INT16, 'successful_dribbles_pct': INT16,
+}
+
+TABLE_SCHEMAS = {
+    'matches': {
+        'gameweek': INT16, 'kickoff_time': STR,
+        'home_team': INT16, 'home_team_elo': FLOAT32, 'home_score': INT8,
+        'away_score': INT8, 'away_team': INT16, 'away_team_elo': FLOAT32,
+        'finished': BOOL, 'match_id': STR, 'match_url': STR, 'tournament': CATEGORY,
+        **_side_stats(_MATCH_TEAM_STATS),
+        'fotmob_id': INT32, 'stats_processed': BOOL, 'player_stats_processed': BOOL,
+    },
+    'playermatchstats': {
+        'match_id': CATEGORY, 'match_url': CATEGORY, 'player_id': INT32, 'gameweek': INT16, 'tournament': CATEGORY,
+        'minutes_played': INT16, 'goals': INT16, 'assists': INT16, 'total_shots': INT16,
+        'xg': FLOAT32, 'xa': FLOAT32, 'xgot': FLOAT32, 'shots_on_target': INT16,
+        'successful_dribbles': INT16, 'big_chances_missed': INT16, 'touches_opposition_box': INT16,
+        'touches': INT16, 'accurate_passes': INT16, 'accurate_passes_percent': INT16,
+        'chances_created': INT16, 'final_third_passes': INT16, 'accurate_crosses': INT16,
+        'accurate_crosses_percent': INT16, 'accurate_long_balls': INT16, 'accurate_long_balls_percent': INT16,
+        'tackles_won': INT16, 'tackles_won_percent': INT16, 'tackles': INT16, 'interceptions': INT16,
+        'recoveries': INT16, 'blocks': INT16, 'clearances': INT16, 'headed_clearances': INT16,
+        'dribbled_past': INT16, 'duels_won': INT16, 'duels_lost': INT16, 'ground_duels_won': INT16,
+        'ground_duels_won_percent': INT16, 'aerial_duels_won': INT16, 'aerial_duels_won_percent': INT16,
+        'was_fouled': INT16, 'fouls_committed': INT16, 'successful_dribbles_percent': INT16,
+        'saves': INT16, 'goals_conceded': INT16, 'xgot_faced': FLOAT32, 'goals_prevented': FLOAT32,
+        'sweeper_actions': INT16, 'high_claim': INT16, 'gk_accurate_long_balls': INT16,
+        'gk_accurate_passes': INT16, 'offsides': INT16,
+    },
+    # Only the identifying columns are listed; the remaining FPL stats follow the
+    # compact rule for unlisted columns (see apply_schema).
+    'playerstats': {
+        'id': INT32, 'gw': INT16, 'status': CATEGORY,
+        'chance_of_playing_next_round': FLOAT32, 'chance_of_playing_this_round': FLOAT32,
+        'now_cost': FLOAT32, 'influence': FLOAT32, 'creativity': FLOAT32, 'threat': FLOAT32,
+        'ict_index': FLOAT32, 'set_piece_threat': FLOAT32,
+        'corners_and_indirect_freekicks_order': INT8, 'direct_freekicks_order': INT8, 'penalties_order': INT8,
+    },
+    'players': {
+        'player_code': INT32, 'player_id': INT32, 'first_name': STR, 'second_name': STR,
+        'web_name': STR, 'team_id': INT16, 'position': CATEGORY,
+    },
+    'teams': {
+        'code': INT16, 'id': INT16, 'name': CATEGORY, 'short_name': CATEGORY,
+        'strength': INT8, 'strength_overall_home': INT16, 'strength_overall_away': INT16,
+        'strength_attack_home': INT16, 'strength_attack_away': INT16,
+        'strength_defence_home': INT16, 'strength_defence_away': INT16,
+        'pulse_id': INT16, 'elo': INT16,
+    },
+}
+
+# Master CSV of each table inside a season folder
+TABLE_PATHS = {
+    'matches': os.path.join('matches', 'matches.csv'),
+    'playermatchstats': os.path.join('playermatchstats', 'playermatchstats.csv'),
+    'playerstats': os.path.join('playerstats', 'playerstats.csv'),
+    'players': os.path.join('players', 'players.csv'),
+    'teams': os.path.join('teams', 'teams.csv'),
+}
+
+
+def _kind(kind, compact):
+    # Storage keeps full floats and plain text; everything else is lossless in both modes.
+    if not compact and kind == FLOAT32:
+        return 'float64'
+    if not compact and kind == CATEGORY:
+        return STR
+    return kind
+
+
+def arrow_types(table_name, compact=True):
+    """pyarrow.csv column_types for a table; categories become dictionary-encoded strings."""
+    types = {}
+    for col, kind in TABLE_SCHEMAS[table_name].items():
+        kind = _kind(kind, compact)
+        if kind == CATEGORY:
+            types[col] = pa.dictionary(pa.int32(), pa.string())
+        elif kind in ('float32', 'float64'):
+            types[col] = pa.float32() if kind == FLOAT32 else pa.float64()
+        else:
+            types[col] = _ARROW_TYPES[kind]
+    return types
+
+
+def apply_schema(df, table_name, compact=True):
+    """
+    Cast `df` to the registry types of `table_name`
+
+    Integer and boolean columns use numpy dtypes when they have no missing
+    values and pandas' nullable dtypes otherwise. An integer column that turns
+    out to hold fractions is kept as a float rather than failing. In compact
+    mode unlisted float columns become float32 and unlisted integer columns
+    are downcast; without it they are left as they are.
+    """
+    if df is None or df.empty:
+        return df
+    schema = TABLE_SCHEMAS[table_name]
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        kind = schema.get(col)
+        if kind is None:
+            series = _downcast(series) if compact else _unmask(series)
+        else:
+            series = _cast(series, _kind(kind, compact), table_name)
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _cast(series, kind, table_name):
+    if kind in _INT_DTYPES:
+        try:
+            series = series.astype(_INT_DTYPES[kind])
+        except (TypeError, ValueError):
+            print(f"Warning: {table_name}.{series.name} is not integral; keeping it as a float")
+            return pd.to_numeric(series, errors='coerce').astype('float64')
+        return series if series.hasnans else series.astype(kind)
+    if kind == BOOL:
+        if series.dtype == object:
+            series = series.map({'True': True, 'False': False, 'true': True, 'false': False,
+                                 True: True, False: False, 1: True, 0: False})
+        series = series.astype('boolean')
+        return series if series.hasnans else series.astype(bool)
+    if kind == STR:
+        return series if series.dtype == object else series.astype(object).where(series.notna(), np.nan)
+    if kind == CATEGORY:
+        return series.astype('category')
+    return pd.to_numeric(series, errors='coerce').astype(kind)
+
+
+def _unmask(series):
+    # Nullable integers / booleans without gaps go back to their numpy dtype
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and series.dtype.kind in 'iub' and not series.hasnans:
+        return series.astype(series.dtype.numpy_dtype)
+    return series
+
+
+def _downcast(series):
+    series = _unmask(series)
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series.astype('float32')
+    if pd.api.types.is_integer_dtype(series.dtype) and not isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+        return pd.to_numeric(series, downcast='integer')
+    return series
+
+
+def read_table_csv(source, table_name, compact=True):
+    """
+    Read a CSV of `table_name` (a path or its bytes) with the registry types instead of inferring them
+    """
+    return table_to_pandas(read_table_arrow(source, table_name, compact), table_name, compact)
+
+
+def read_table_arrow(source, table_name, compact=True):
+    """
+    Read a CSV of `table_name` (a path or its bytes) into an Arrow table with the registry types
+
+    Only columns missing from the registry are inferred. Integer columns are
+    parsed as floats first, since pandas writes them as '2.0' whenever they
+    have gaps, and then cast; one holding real fractions stays a float.
+    """
+    types = arrow_types(table_name, compact)
+    int_cols = {col: t for col, t in types.items() if pa.types.is_integer(t)}
+    table = _read_csv(source, {**types, **{col: pa.float64() for col in int_cols}})
+    # pd.read_csv leaves timestamps as text; keep unlisted ones that way too
+    stamps = {field.name: pa.string() for field in table.schema if pa.types.is_timestamp(field.type)}
+    if stamps:
+        table = _read_csv(source, {**types, **{col: pa.float64() for col in int_cols}, **stamps})
+
+    for col, int_type in int_cols.items():
+        index = table.schema.get_field_index(col)
+        if index < 0:
+            continue
+        try:
+            table = table.set_column(index, col, table.column(col).cast(int_type))
+        except pa.ArrowInvalid:
+            pass  # not integral; apply_schema keeps it as a float and warns
+    return table
+
+
+def _read_csv(source, column_types):
+    if isinstance(source, bytes):
+        source = pa.BufferReader(source)
+    convert_options = pacsv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+    return pacsv.read_csv(source, convert_options=convert_options)
+
+
+def table_to_pandas(table, table_name, compact=True):
+    """Convert an Arrow table read with the registry types to pandas, keeping integer columns integral."""
+    return apply_schema(table.to_pandas(types_mapper=_PANDAS_TYPES.get), table_name, compact)
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def memory_report(season_path):
+    """
+    Load every master CSV of a season with inferred types and with the registry, and compare size and load time
+    """
+    rows = []
+    for table_name, rel_path in TABLE_PATHS.items():
+        path = os.path.join(season_path, rel_path)
+        if not os.path.exists(path):
+            path = os.path.join(season_path, f"{table_name}.csv")
+            if not os.path.exists(path):
+                continue
+        start = time.perf_counter()
+        inferred = pd.read_csv(path)
+        inferred_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        compact = read_table_csv(path, table_name)
+        compact_seconds = time.perf_counter() - start
+        rows.append({
+            'table': table_name,
+            'rows': len(inferred),
+            'inferred_mb': round(memory_mb(inferred), 2),
+            'compact_mb': round(memory_mb(compact), 2),
+            'ratio': round(memory_mb(compact) / max(memory_mb(inferred), 1e-9), 2),
+            'inferred_s': round(inferred_seconds, 3),
+            'compact_s': round(compact_seconds, 3),
+        })
+
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+    return report
+
+
+if __name__ == "__main__":
+    # Run from the repository root: python -m scripts.schema [season_path]
+    parser = argparse.ArgumentParser(description="Report the in-memory size of each table with and without the schema registry.")
+    parser.add_argument('season_path', nargs='?', default=os.path.join('data', '2024-2025'))
+    memory_report(parser.parse_args().season_path)
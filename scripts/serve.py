@@ -0,0 +1,294 @@
+import argparse
+import json
+import queue
+import threading
+import time
+import numpy as np
+import polars as pl
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.model import FPLPointPredictor
+
+# Requests arriving within MAX_WAIT_MS of the first one share a single model.predict call
+MAX_BATCH_ROWS = 8192
+MAX_WAIT_MS = 2.0
+# Latencies kept for the p50/p99 in /metrics
+LATENCY_WINDOW = 10000
+
+
+def load_feature_rows(path):
+    """
+    Latest feature row of every player from a parquet or CSV file of create_ml_feature_set output
+    """
+    df = pl.read_parquet(path) if str(path).endswith('.parquet') else pl.read_csv(path)
+    return df.sort(['element', 'gameweek']).unique('element', keep='last', maintain_order=True)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent prediction requests and runs them as one vectorized predict call
+
+    `predict_rows` maps an array of feature-row indices to predictions. A batch
+    is closed after MAX_WAIT_MS or once it reaches MAX_BATCH_ROWS rows.
+    """
+
+    def __init__(self, predict_rows, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS, on_batch=None):
+        self.predict_rows = predict_rows
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.on_batch = on_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def predict(self, rows):
+        future = Future()
+        self._queue.put((np.asarray(rows, dtype=np.int64), future))
+        return future.result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, size = [item], len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while size < self.max_batch_rows:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            self._predict_batch(batch)
+            if stop:
+                return
+
+    def _predict_batch(self, batch):
+        try:
+            predictions = self.predict_rows(np.concatenate([rows for rows, _ in batch]))
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        if self.on_batch is not None:
+            self.on_batch(len(batch), len(predictions))
+        offsets = np.cumsum([0] + [len(rows) for rows, _ in batch])
+        for (_, future), start, stop in zip(batch, offsets[:-1], offsets[1:]):
+            future.set_result(predictions[start:stop])
+
+
+class ServiceMetrics:
+    """
+    Request latency percentiles and throughput counters, safe to update from handler threads
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.predictions = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record_request(self, seconds, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+            self._latencies.append(seconds)
+
+    def record_batch(self, requests, rows):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += requests
+            self.predictions += rows
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            uptime = time.time() - self.started
+            p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (None, None)
+            return {
+                'uptime_seconds': round(uptime, 1),
+                'requests': self.requests,
+                'errors': self.errors,
+                'predictions': self.predictions,
+                'batches': self.batches,
+                'mean_requests_per_batch': round(self.batched_requests / self.batches, 2) if self.batches else None,
+                'requests_per_second': round(self.requests / uptime, 2) if uptime > 0 else None,
+                'latency_ms': {
+                    'p50': None if p50 is None else round(float(p50), 3),
+                    'p99': None if p99 is None else round(float(p99), 3),
+                    'window': len(latencies),
+                },
+            }
+
+
+class PredictionService:
+    """
+    A loaded predictor plus the latest feature row of every player, kept in memory
+
+    The feature matrix is built once; requests only look up row indices, and
+    the model runs on batches gathered by a MicroBatcher.
+    """
+
+    def __init__(self, predictor, feature_rows, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+        self.predictor = predictor
+        self.rows = feature_rows
+        self.X = predictor.prepare_features(feature_rows, columns=predictor.trained_feature_columns)
+        self.row_of = {int(element): i for i, element in enumerate(feature_rows['element'].to_list())}
+        self.values = feature_rows['value'].to_numpy().astype(np.float64) / 10 if 'value' in feature_rows.columns \
+            else None
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(self._predict_rows, max_batch_rows, max_wait_ms, self.metrics.record_batch)
+
+    def _predict_rows(self, rows):
+        return np.asarray(self.predictor.model.predict(self.predictor._scale(self.X[rows])), dtype=np.float64)
+
+    def _rows_for(self, elements):
+        if elements is None:
+            return np.arange(len(self.row_of)), []
+        rows, unknown = [], []
+        for element in elements:
+            row = self.row_of.get(int(element))
+            if row is None:
+                unknown.append(element)
+            else:
+                rows.append(row)
+        return np.array(rows, dtype=np.int64), unknown
+
+    def predict(self, elements=None):
+        """Predicted points (and points per £m) for `elements`, default every player."""
+        rows, unknown = self._rows_for(elements)
+        predictions = self.batcher.predict(rows) if len(rows) else np.array([])
+        result = []
+        for row, points in zip(rows, predictions):
+            entry = {'element': int(self.rows['element'][int(row)]), 'predicted_points': float(points)}
+            if self.values is not None:
+                entry['predicted_value'] = float(points / self.values[row])
+            result.append(entry)
+        return {'predictions': result, 'unknown': unknown}
+
+    def top_picks(self, elements=None, n_per_position=5, sort_by='predicted_points'):
+        """get_top_picks over the predictions for `elements`, default every player."""
+        rows, unknown = self._rows_for(elements)
+        predictions = self.batcher.predict(rows) if len(rows) else np.array([])
+        frame = self.rows[rows].with_columns(pl.Series('predicted_points', predictions))
+        frame = frame.with_columns((pl.col('predicted_points') / (pl.col('value') / 10)).alias('predicted_value'))
+        picks = self.predictor.get_top_picks(frame, n_per_position=n_per_position, sort_by=sort_by)
+        return {'top_picks': {pos: df.to_dicts() for pos, df in picks.items()}, 'unknown': unknown}
+
+    def close(self):
+        self.batcher.close()
+
+
+def make_handler(service):
+    """
+    HTTP handler for `service`:
+      GET  /health, GET /metrics
+      POST /predict    {"elements": [...]}
+      POST /top-picks  {"elements": [...], "n_per_position": 5, "sort_by": "predicted_points"}
+    Omitting "elements" means every player.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, {'status': 'ok', 'players': len(service.row_of)})
+            elif self.path == '/metrics':
+                self._reply(200, service.metrics.snapshot())
+            else:
+                self._reply(404, {'error': f'Unknown path {self.path}'})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            error = True
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if self.path == '/predict':
+                    self._reply(200, service.predict(body.get('elements')))
+                elif self.path == '/top-picks':
+                    self._reply(200, service.top_picks(
+                        body.get('elements'), int(body.get('n_per_position', 5)),
+                        body.get('sort_by', 'predicted_points'),
+                    ))
+                else:
+                    self._reply(404, {'error': f'Unknown path {self.path}'})
+                    return
+                error = False
+            except (ValueError, TypeError, KeyError, AttributeError, pl.exceptions.PolarsError) as e:
+                self._reply(400, {'error': str(e)})
+            except Exception as e:
+                # e.g. a model error raised through the batch; the client still gets an answer
+                self._reply(500, {'error': f'{type(e).__name__}: {e}'})
+            finally:
+                service.metrics.record_request(time.perf_counter() - start, error=error)
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # One line per request would dominate the cost of a prediction
+            pass
+
+    return Handler
+
+
+def start_server(service, host='127.0.0.1', port=0):
+    """
+    Serve `service` from a background thread; port 0 picks a free port (see server.server_address)
+
+    Stop it with server.shutdown() and service.close().
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='prediction-server', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve point predictions from a saved predictor over local HTTP.")
+    parser.add_argument('--bundle', required=True, help="Directory written by FPLPointPredictor.save")
+    parser.add_argument('--features', required=True, help="Parquet/CSV of create_ml_feature_set rows")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    service = PredictionService(FPLPointPredictor.load(args.bundle), load_feature_rows(args.features),
+                                max_wait_ms=args.max_wait_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f"Serving {len(service.row_of)} players on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    # Run from the repository root: python -m scripts.serve --bundle <dir> --features <file>
+    main()
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import math
+import os
+import time
+import numpy as np
+import polars as pl
+from sklearn.base import clone
+
+from scripts.backtest import fold_runner, fold_tasks, sort_by_gameweek, with_threads
+
+# Values tried for each model parameter; candidates are random combinations of them
+XGB_SEARCH_SPACE = {
+    'max_depth': [3, 4, 5, 6, 8],
+    'learning_rate': [0.02, 0.05, 0.1, 0.2],
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.5, 0.7, 0.9, 1.0],
+}
+GB_SEARCH_SPACE = {
+    'max_depth': [2, 3, 4, 5],
+    'learning_rate': [0.02, 0.05, 0.1, 0.2],
+    'subsample': [0.6, 0.8, 1.0],
+    'min_samples_split': [2, 10, 50],
+}
+SEARCH_SPACES = {'XGBoostBackend': XGB_SEARCH_SPACE, 'GradientBoostingRegressor': GB_SEARCH_SPACE}
+
+# Successive halving: each rung gets ETA times the resource of the previous one and keeps the best 1/ETA
+ETA = 3
+# Resource ranges per kind: tree count, or the most recent fraction of each fold's training rows
+RESOURCE_RANGES = {'n_estimators': (100, 900), 'data_fraction': (1 / 9, 1.0)}
+
+
+def sample_candidates(space, n_candidates, seed=0):
+    """
+    Up to `n_candidates` distinct parameter dicts drawn at random from `space`
+    """
+    rng = np.random.default_rng(seed)
+    names = sorted(space)
+    n_candidates = min(n_candidates, math.prod(len(space[name]) for name in names))
+    candidates, seen = [], set()
+    while len(candidates) < n_candidates:
+        params = {name: space[name][rng.integers(len(space[name]))] for name in names}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def halving_rungs(n_candidates, min_resource, max_resource, eta=ETA):
+    """
+    (candidates kept, resource) of every successive halving rung, ending at `max_resource`
+    """
+    n_rungs = max(1, int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9)) + 1)
+    rungs = []
+    for rung in range(n_rungs):
+        resource = max_resource / eta ** (n_rungs - 1 - rung)
+        rungs.append((max(1, n_candidates // eta ** rung), resource))
+    return rungs
+
+
+def successive_halving(predictor, df, space=None, n_candidates=27, resource='n_estimators', min_resource=None,
+                       max_resource=None, eta=ETA, n_folds=2, horizon=1, max_workers=None, log_path=None, seed=0):
+    """
+    Search `predictor`'s model parameters with successive halving on walk-forward folds
+
+    Every candidate from `space` (default per model type) is scored by its mean
+    validation MAE over the last `n_folds` gameweek folds, first with a small
+    `resource` (tree count, or the most recent fraction of training rows);
+    only the best 1/`eta` move on to the next rung, with `eta` times more.
+    The feature matrix is built once and shared by a process pool that runs
+    all folds of all candidates of a rung in parallel.
+
+    Each finished trial is appended to `log_path` (JSON lines) together with
+    a fingerprint of the search and the data; running the same search again
+    reuses the logged trials, so an interrupted search resumes where it
+    stopped. Returns (trials frame, best parameters); with the 'n_estimators'
+    resource, the best parameters include the tree count they were scored at.
+    """
+    if resource not in RESOURCE_RANGES:
+        raise ValueError(f"Unknown resource '{resource}', expected one of {list(RESOURCE_RANGES)}")
+    space = space or SEARCH_SPACES.get(type(predictor.model).__name__)
+    if space is None:
+        raise ValueError(f"No default search space for {type(predictor.model).__name__}; pass `space`")
+    low, high = RESOURCE_RANGES[resource]
+    min_resource, max_resource = min_resource or low, max_resource or high
+
+    df = sort_by_gameweek(df)
+    X = predictor.prepare_features(df)
+    y = df[predictor.target_col].to_numpy().astype(np.float64)
+    tasks = fold_tasks(df['gameweek'].to_numpy(), n_folds, horizon)
+    candidates = sample_candidates(space, n_candidates, seed)
+    rungs = halving_rungs(len(candidates), min_resource, max_resource, eta)
+
+    fingerprint = _search_fingerprint(predictor, X, y, space, candidates, resource, rungs, tasks)
+    logged = _load_trials(log_path, fingerprint)
+    if logged:
+        print(f"Resuming search: {len(logged)} trials already in '{log_path}'")
+
+    workers = min(max_workers or os.cpu_count() or 1, len(candidates) * len(tasks))
+    base_model = with_threads(predictor.model, workers)
+    trials = []
+    alive = list(range(len(candidates)))
+    start = time.perf_counter()
+    with fold_runner({'X': X, 'y': y}, workers) as run:
+        for rung, (keep, amount) in enumerate(rungs):
+            alive = alive[:keep] if rung == 0 else _best(trials, rung - 1, keep)
+            todo = [config_id for config_id in alive if (config_id, rung) not in logged]
+            print(f"Rung {rung}: {len(alive)} candidates with {resource}={amount:g} "
+                  f"({len(alive) - len(todo)} from the log)")
+
+            jobs = []
+            for config_id in todo:
+                model = _with_resource(clone(base_model).set_params(**candidates[config_id]), resource, amount)
+                jobs += [(model, predictor.scale_features, _with_fraction(task, resource, amount)) for task in tasks]
+            results = iter(run(jobs))
+
+            for config_id in alive:
+                trial = logged.get((config_id, rung))
+                if trial is None:
+                    folds = [next(results) for _ in tasks]
+                    trial = {
+                        'search': fingerprint, 'config_id': config_id, 'rung': rung, 'resource': amount,
+                        'params': candidates[config_id],
+                        'mae': float(np.mean([fold['mae'] for fold in folds])),
+                        'r2': float(np.mean([fold['r2'] for fold in folds])),
+                        'seconds': round(sum(fold['fit_seconds'] + fold['predict_seconds'] for fold in folds), 3),
+                    }
+                    _append_trial(log_path, trial)
+                trials.append(trial)
+
+    table = pl.DataFrame([{**{k: v for k, v in trial.items() if k not in ('search', 'params')},
+                           'params': json.dumps(trial['params'], sort_keys=True)} for trial in trials])
+    table = table.sort(['rung', 'mae'], descending=[True, False])
+    best = dict(candidates[table['config_id'][0]])
+    if resource == 'n_estimators':
+        # The winner was ranked at the last rung's tree count; a learning rate is only good for that many trees
+        best['n_estimators'] = int(round(table['resource'][0]))
+    print(f"Search of {len(candidates)} candidates took {time.perf_counter() - start:.1f}s; "
+          f"best MAE {table['mae'][0]:.3f} with {best}")
+    return table, best
+
+
+def _best(trials, rung, keep):
+    scored = sorted((trial['mae'], trial['config_id']) for trial in trials if trial['rung'] == rung)
+    return sorted(config_id for _, config_id in scored[:keep])
+
+
+def _with_resource(model, resource, amount):
+    if resource == 'n_estimators':
+        model.set_params(n_estimators=int(round(amount)))
+    return model
+
+
+def _with_fraction(task, resource, amount):
+    if resource != 'data_fraction':
+        return task
+    # The most recent rows, which are the most like the validation gameweeks
+    rows = task['train_stop'] - task['train_start']
+    return {**task, 'train_start': task['train_stop'] - max(1, int(round(rows * amount)))}
+
+
+def _search_fingerprint(predictor, X, y, space, candidates, resource, rungs, tasks):
+    # Trials are only reused by the same search on the same data
+    digest = hashlib.sha256(np.ascontiguousarray(X).tobytes())
+    digest.update(y.tobytes())
+    digest.update(json.dumps({
+        'model': type(predictor.model).__name__,
+        'model_params': {k: repr(v) for k, v in predictor.model.get_params().items() if k != 'n_jobs'},
+        'scale_features': predictor.scale_features,
+        'space': space, 'candidates': candidates, 'resource': resource, 'rungs': rungs,
+        'folds': [(task['train_stop'], task['val_stop']) for task in tasks],
+    }, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+def _load_trials(log_path, fingerprint):
+    if log_path is None or not os.path.exists(log_path):
+        return {}
+    trials = {}
+    with open(log_path) as f:
+        for line in f:
+            try:
+                trial = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted write
+                continue
+            if trial.get('search') == fingerprint:
+                trials[(trial['config_id'], trial['rung'])] = trial
+    return trials
+
+
+def _append_trial(log_path, trial):
+    if log_path is None:
+        return
+    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+    with open(log_path, 'ab+') as f:
+        # Don't extend a line cut short by an interrupted write
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+        f.write((json.dumps(trial) + '\n').encode())
+        f.flush()
+        os.fsync(f.fileno())
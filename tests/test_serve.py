@@ -0,0 +1,123 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+import polars as pl
+import pytest
+
+from scripts.model import FPLPointPredictor
+from scripts.serve import PredictionService, start_server
+
+N_PLAYERS = 40
+POSITIONS = ['GKP', 'DEF', 'MID', 'FWD']
+
+
+@pytest.fixture
+def service():
+    rng = np.random.default_rng(0)
+    rows = pl.DataFrame({
+        'element': np.arange(1, N_PLAYERS + 1),
+        'gameweek': np.full(N_PLAYERS, 5),
+        'name': [f'Player {i}' for i in range(1, N_PLAYERS + 1)],
+        'team': [f'Team {i % 10}' for i in range(N_PLAYERS)],
+        'position': [POSITIONS[i % 4] for i in range(N_PLAYERS)],
+        'value': rng.integers(40, 130, N_PLAYERS),
+        'form': rng.normal(3, 1, N_PLAYERS),
+        'minutes_last5': rng.uniform(0, 90, N_PLAYERS),
+        'total_points': rng.integers(0, 12, N_PLAYERS),
+    })
+    predictor = FPLPointPredictor(analysis_cols=['element', 'gameweek', 'name', 'team', 'position', 'value'])
+    predictor.model.set_params(n_estimators=5, max_depth=2)
+    predictor.model.fit(predictor.prepare_features(rows), rows['total_points'].to_numpy())
+    predictor.trained_feature_columns = list(predictor.feature_columns)
+
+    # A long batching window, so concurrent requests reliably share a batch
+    service = PredictionService(predictor, rows, max_wait_ms=50)
+    server = start_server(service, port=0)
+    service.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield service
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def request(service, path, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(service.url + path, data=data), timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_predict_matches_model(service):
+    status, payload = request(service, '/predict', {'elements': [3, 17, 999]})
+    assert status == 200
+    assert payload['unknown'] == [999]
+    expected = service.predictor.model.predict(service.X[[2, 16]])
+    assert [p['element'] for p in payload['predictions']] == [3, 17]
+    np.testing.assert_allclose([p['predicted_points'] for p in payload['predictions']], expected)
+    values = service.rows['value'].to_numpy()[[2, 16]] / 10
+    np.testing.assert_allclose([p['predicted_value'] for p in payload['predictions']], expected / values)
+
+
+def test_top_picks(service):
+    status, payload = request(service, '/top-picks', {'n_per_position': 3})
+    assert status == 200
+    picks = payload['top_picks']
+    assert sorted(picks) == sorted(POSITIONS)
+    predictions = service.predictor.model.predict(service.X)
+    for position, rows in picks.items():
+        assert len(rows) == 3
+        points = [row['predicted_points'] for row in rows]
+        assert points == sorted(points, reverse=True)
+        in_position = predictions[service.rows['position'].to_numpy() == position]
+        np.testing.assert_allclose(points, np.sort(in_position)[::-1][:3])
+
+
+def test_metrics_and_errors(service):
+    for _ in range(5):
+        assert request(service, '/predict', {'elements': [1, 2]})[0] == 200
+    assert request(service, '/predict', {'elements': ['x']})[0] == 400
+
+    status, metrics = request(service, '/metrics')
+    assert status == 200
+    assert metrics['requests'] == 6
+    assert metrics['errors'] == 1
+    assert metrics['predictions'] == 10
+    latency = metrics['latency_ms']
+    assert latency['window'] == 6
+    assert 0 < latency['p50'] <= latency['p99']
+
+
+def test_model_failure_replies_500(service):
+    def fail(rows):
+        raise RuntimeError('model exploded')
+
+    service.batcher.predict_rows = fail
+    status, payload = request(service, '/predict', {'elements': [1]})
+    assert status == 500
+    assert 'model exploded' in payload['error']
+    assert request(service, '/metrics')[1]['errors'] == 1
+
+
+def test_concurrent_requests_share_a_batch(service):
+    n_clients = 8
+    barrier = threading.Barrier(n_clients)
+    statuses = []
+
+    def client(element):
+        barrier.wait()
+        statuses.append(request(service, '/predict', {'elements': [element]})[0])
+
+    threads = [threading.Thread(target=client, args=(i + 1,)) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * n_clients
+    metrics = request(service, '/metrics')[1]
+    assert metrics['predictions'] == n_clients
+    assert metrics['mean_requests_per_batch'] > 1